@@ -0,0 +1,116 @@
+"""Per-request latency of AuthClient.validate_token with and without pooling
+
+Starts a stand-in auth app on a local port and times ``validate_token``
+calls made through a fresh ``httpx.AsyncClient`` per call (the old
+behaviour) against calls through a single long-lived pooled client. The
+pooled client runs with its validation cache off, so every call goes to
+the stand-in; a last row shows the same client with the cache on.
+
+Run from this directory:
+
+    uv run python auth_client_pool.py --requests 500 --concurrency 10
+"""
+import argparse
+import asyncio
+import json
+import socket
+import threading
+import time
+
+import httpx
+import uvicorn
+from fastapi import FastAPI
+
+from shared.auth_client import AuthClient
+from shared.schemas.user import UserResponse
+
+from stats import summarize
+
+stand_in_auth = FastAPI()
+
+
+@stand_in_auth.get("/auth/validate")
+def validate(token: str):
+    return {
+        "id": 1,
+        "username": "bench",
+        "first_name": "Bench",
+        "created_at": "2024-01-01T00:00:00",
+    }
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(port: int) -> uvicorn.Server:
+    config = uvicorn.Config(stand_in_auth, host="127.0.0.1", port=port, log_level="warning")
+    server = uvicorn.Server(config)
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+    return server
+
+
+async def validate_unpooled(base_url: str, token: str) -> UserResponse:
+    """Previous behaviour: a brand new client (and connection) per call"""
+    async with httpx.AsyncClient(timeout=30.0) as client:
+        response = await client.get(f"{base_url}/auth/validate", params={"token": token})
+        return UserResponse(**response.json())
+
+
+async def run(label: str, call, requests: int, concurrency: int) -> dict:
+    latencies = []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with semaphore:
+            started = time.perf_counter()
+            await call()
+            latencies.append((time.perf_counter() - started) * 1000)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(requests)))
+    elapsed = time.perf_counter() - started
+
+    return {
+        "label": label,
+        "requests": requests,
+        "concurrency": concurrency,
+        **summarize(latencies, elapsed),
+    }
+
+
+async def main(requests: int, concurrency: int) -> None:
+    port = free_port()
+    server = start_server(port)
+    base_url = f"http://127.0.0.1:{port}"
+
+    auth_client = AuthClient(base_url, cache_ttl=0)
+    cached_client = AuthClient(base_url)
+    await auth_client.start()
+    await cached_client.start()
+    try:
+        results = [
+            await run("per-call client", lambda: validate_unpooled(base_url, "token"), requests, concurrency),
+            await run("pooled client", lambda: auth_client.validate_token("token"), requests, concurrency),
+            await run("pooled client, cached", lambda: cached_client.validate_token("token"), requests, concurrency),
+        ]
+        results[-1]["cache"] = cached_client.cache_stats()
+    finally:
+        await auth_client.aclose()
+        await cached_client.aclose()
+        server.should_exit = True
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=10)
+    args = parser.parse_args()
+    asyncio.run(main(args.requests, args.concurrency))
@@ -0,0 +1,115 @@
+"""Storage and read-latency benchmark for note content compression at rest
+
+For several note sizes, stores the same rows in SQLite as plain text and
+through shared.text_codec.CompressedText (zlib, and zstd when installed),
+then reports database file size, insert time, point-read and full-scan
+latency, and the cost of the snippet read used by summary listings.
+
+Note text is generated from a word list so it compresses roughly like
+prose rather than like a repeated string. Run from this directory:
+
+    uv run python content_compression.py --rows 200
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+
+from sqlalchemy import Column, Integer, MetaData, String, Table, create_engine, func, insert, select, type_coerce
+
+from shared.text_codec import ZLIB, ZSTD, CompressedText, CompressedTextPrefix, stored_prefix_length, zstandard
+from stats import summarize
+
+SIZES = (1_024, 16_384, 262_144)
+SNIPPET_LENGTH = 200
+WORDS = (
+    "note meeting project deadline review design api latency database cache user "
+    "request service deploy release budget roadmap customer feedback bug fix test "
+    "the a of and to in for on with is was this that it be are as at by from"
+).split()
+
+
+def make_text(rng: random.Random, size: int) -> str:
+    words = []
+    length = 0
+    while length < size:
+        word = rng.choice(WORDS)
+        words.append(word)
+        length += len(word) + 1
+    return " ".join(words)[:size]
+
+
+def run_case(label: str, column_type, texts, point_reads: int) -> dict:
+    with tempfile.TemporaryDirectory() as workdir:
+        path = os.path.join(workdir, "bench.db")
+        engine = create_engine(f"sqlite:///{path}")
+        table = Table(
+            "notes", MetaData(),
+            Column("id", Integer, primary_key=True),
+            Column("content", column_type, nullable=False),
+        )
+        table.metadata.create_all(engine)
+
+        started = time.perf_counter()
+        with engine.begin() as conn:
+            conn.execute(insert(table), [{"content": text} for text in texts])
+        insert_seconds = time.perf_counter() - started
+
+        rng = random.Random(1)
+        point_latencies = []
+        with engine.connect() as conn:
+            for _ in range(point_reads):
+                note_id = rng.randint(1, len(texts))
+                started = time.perf_counter()
+                conn.execute(select(table.c.content).where(table.c.id == note_id)).scalar_one()
+                point_latencies.append((time.perf_counter() - started) * 1000)
+
+            started = time.perf_counter()
+            conn.execute(select(table.c.content)).scalars().all()
+            scan_ms = (time.perf_counter() - started) * 1000
+
+            # Mirrors the summary listing: plain rows are cut to the snippet
+            # in SQL, compressed rows to a bounded prefix that is decoded
+            stored = type_coerce(table.c.content, String)
+            stored_length = SNIPPET_LENGTH if column_type is String else stored_prefix_length(SNIPPET_LENGTH)
+            stored = func.substr(stored, 1, stored_length)
+            snippet = type_coerce(stored, CompressedTextPrefix(SNIPPET_LENGTH, stored_length))
+            started = time.perf_counter()
+            conn.execute(select(snippet)).scalars().all()
+            snippet_scan_ms = (time.perf_counter() - started) * 1000
+
+        engine.dispose()
+        return {
+            "codec": label,
+            "db_bytes": os.path.getsize(path),
+            "insert_ms": round(insert_seconds * 1000, 3),
+            "point_read": summarize(point_latencies, sum(point_latencies) / 1000),
+            "full_scan_ms": round(scan_ms, 3),
+            "snippet_scan_ms": round(snippet_scan_ms, 3),
+        }
+
+
+def main(rows: int, point_reads: int) -> dict:
+    codecs = [("plain", String), (ZLIB, CompressedText(threshold=0, codec=ZLIB))]
+    if zstandard is not None:
+        codecs.append((ZSTD, CompressedText(threshold=0, codec=ZSTD, level=3)))
+
+    rng = random.Random(0)
+    results = []
+    for size in SIZES:
+        texts = [make_text(rng, size) for _ in range(rows)]
+        raw_bytes = sum(len(text.encode()) for text in texts)
+        for label, column_type in codecs:
+            result = run_case(label, column_type, texts, point_reads)
+            results.append({"note_bytes": size, "rows": rows, "raw_bytes": raw_bytes, **result})
+    return {"results": results}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=200, help="Notes stored per case")
+    parser.add_argument("--point-reads", type=int, default=500, help="Single-note reads per case")
+    args = parser.parse_args()
+    print(json.dumps(main(args.rows, args.point_reads), indent=2))
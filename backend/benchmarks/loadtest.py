@@ -0,0 +1,291 @@
+"""Load and latency benchmark for the auth and notes services
+
+Boots both FastAPI apps in this process against throwaway SQLite files,
+seeds ``--users`` users with ``--notes`` notes each, and then drives each
+workload with ``--concurrency`` concurrent clients over httpx's ASGI
+transport (no sockets, network or Docker). The notes service's auth client
+is pointed at the in-process auth app, so token validation takes the same
+code path as in production.
+
+Results (throughput, mean/p50/p95/p99 latency, error counts and the most
+SQL statements a request ran, per workload) are printed as JSON so runs
+can be diffed. A request running more statements than its workload's
+entry in QUERY_BUDGETS counts as a "query_budget" error, so the run
+doubles as a query-count regression check. Run from this directory:
+
+    uv run python loadtest.py --users 20 --notes 50 --requests 500 --output run.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+from contextlib import AsyncExitStack
+
+import httpx
+
+from shared.query_budget import response_query_count
+from shared.services import load_service
+from stats import summarize
+
+WORKLOADS = ("signup", "token", "validate", "list", "get", "create", "update", "delete")
+PASSWORD = "benchmark-password"
+
+# Most SQL statements one request of each workload may run, as reported by
+# the services' X-DB-Query-Count header; a request over budget is an error
+QUERY_BUDGETS = {
+    "signup": 3,
+    "token": 1,
+    "validate": 0,
+    "list": 2,
+    "get": 1,
+    "create": 5,
+    "update": 6,
+    "delete": 4,
+}
+
+
+def configure_environment(bcrypt_rounds: int) -> None:
+    """Settings are read at import time, so this must run before load_service()"""
+    os.environ.update(
+        FRONTEND_URL="http://localhost",
+        JWT_SECRET_KEY="benchmark-secret",
+        AUTH_SERVICE_URL="http://auth.bench",
+        COOKIE_SECURE="false",
+        BCRYPT_ROUNDS=str(bcrypt_rounds),
+        # Every simulated client shares one IP, so admission control would
+        # measure the limiter rather than the service
+        RATE_LIMIT_ENABLED="false",
+        QUERY_STATS_HEADERS="true",
+    )
+
+
+def load_app(name: str, workdir: str):
+    # One database file per service, as in the docker-compose setup
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, name + '.db')}"
+    return load_service(name)["main"]
+
+
+class Bench:
+    """Seeded state shared by the workloads"""
+
+    def __init__(self, auth: httpx.AsyncClient, notes: httpx.AsyncClient, seed: int):
+        self.auth = auth
+        self.notes = notes
+        self.random = random.Random(seed)
+        self.users: list[dict] = []
+        self.created: list[tuple[dict, int]] = []
+
+    def pick_user(self) -> dict:
+        return self.random.choice(self.users)
+
+    def pick_note(self) -> tuple[dict, int]:
+        user = self.pick_user()
+        return user, self.random.choice(user["note_ids"])
+
+    async def signup(self, username: str) -> httpx.Response:
+        return await self.auth.post(
+            "/auth/signup",
+            json={"username": username, "password": PASSWORD, "first_name": "Bench"},
+        )
+
+    async def login(self, username: str) -> httpx.Response:
+        return await self.auth.post(
+            "/auth/token", data={"username": username, "password": PASSWORD}
+        )
+
+    async def seed(self, users: int, notes_per_user: int) -> None:
+        for index in range(users):
+            username = f"seed-{index}"
+            (await self.signup(username)).raise_for_status()
+            response = await self.login(username)
+            response.raise_for_status()
+            token = response.json()["access_token"]
+            user = {
+                "username": username,
+                "token": token,
+                "headers": {"Authorization": f"Bearer {token}"},
+                "note_ids": [],
+            }
+
+            operations = [
+                {"op": "create", "title": f"Note {n}", "content": f"Seeded note {n} for {username}. " * 10}
+                for n in range(notes_per_user)
+            ]
+            if operations:
+                response = await self.notes.post(
+                    "/note/notes/bulk", json={"operations": operations}, headers=user["headers"]
+                )
+                response.raise_for_status()
+                user["note_ids"] = [item["id"] for item in response.json()["results"]]
+            self.users.append(user)
+
+    # One coroutine per workload; each returns the response to check
+
+    async def run_signup(self, i: int) -> httpx.Response:
+        return await self.signup(f"signup-{i}")
+
+    async def run_token(self, i: int) -> httpx.Response:
+        return await self.login(self.pick_user()["username"])
+
+    async def run_validate(self, i: int) -> httpx.Response:
+        return await self.auth.get("/auth/validate", params={"token": self.pick_user()["token"]})
+
+    async def run_list(self, i: int) -> httpx.Response:
+        return await self.notes.get("/note/notes", headers=self.pick_user()["headers"])
+
+    async def run_get(self, i: int) -> httpx.Response:
+        user, note_id = self.pick_note()
+        return await self.notes.get(f"/note/notes/{note_id}", headers=user["headers"])
+
+    async def run_create(self, i: int) -> httpx.Response:
+        user = self.pick_user()
+        response = await self.notes.post(
+            "/note/notes",
+            json={"title": f"Created {i}", "content": "Benchmark note body. " * 10},
+            headers=user["headers"],
+        )
+        if response.status_code == 200:
+            self.created.append((user, response.json()["id"]))
+        return response
+
+    async def run_update(self, i: int) -> httpx.Response:
+        user, note_id = self.pick_note()
+        return await self.notes.put(
+            f"/note/notes/{note_id}",
+            json={"id": note_id, "title": f"Updated {i}", "content": "Updated benchmark note body. " * 10},
+            headers=user["headers"],
+        )
+
+    async def run_delete(self, i: int) -> httpx.Response:
+        # Deletes the notes made by the create workload, so seeded data is untouched
+        if not self.created:
+            raise RuntimeError("delete workload needs notes from the create workload")
+        user, note_id = self.created.pop()
+        return await self.notes.delete(f"/note/notes/{note_id}", headers=user["headers"])
+
+
+async def run_workload(bench: Bench, name: str, requests: int, concurrency: int) -> dict:
+    operation = getattr(bench, f"run_{name}")
+    if name == "delete":
+        requests = min(requests, len(bench.created))
+
+    latencies: list[float] = []
+    errors: dict[str, int] = {}
+    queries: list[int] = []
+    counter = iter(range(requests))
+
+    async def worker():
+        for i in counter:
+            started = time.perf_counter()
+            try:
+                response = await operation(i)
+                failure = None if response.status_code < 400 else str(response.status_code)
+                count = response_query_count(response.headers)
+                if count is not None:
+                    queries.append(count)
+                    if failure is None and count > QUERY_BUDGETS[name]:
+                        failure = "query_budget"
+            except Exception as error:
+                failure = type(error).__name__
+            latencies.append((time.perf_counter() - started) * 1000)
+            if failure is not None:
+                errors[failure] = errors.get(failure, 0) + 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    return {
+        "workload": name,
+        "requests": requests,
+        "concurrency": concurrency,
+        "errors": sum(errors.values()),
+        "error_types": errors,
+        "queries_max": max(queries, default=None),
+        "query_budget": QUERY_BUDGETS[name],
+        **summarize(latencies, elapsed),
+    }
+
+
+async def main(args: argparse.Namespace) -> dict:
+    with tempfile.TemporaryDirectory(prefix="jarvis-bench-") as workdir:
+        configure_environment(args.bcrypt_rounds)
+        auth_main = load_app("auth", workdir)
+        notes_main = load_app("notes", workdir)
+
+        # Route the notes service's auth calls to the in-process auth app
+        notes_main.notes.auth_client.client.transport = httpx.ASGITransport(app=auth_main.app)
+
+        async with AsyncExitStack() as stack:
+            for service in (auth_main, notes_main):
+                await stack.enter_async_context(service.app.router.lifespan_context(service.app))
+            auth = await stack.enter_async_context(httpx.AsyncClient(
+                transport=httpx.ASGITransport(app=auth_main.app), base_url="http://auth.bench"
+            ))
+            notes = await stack.enter_async_context(httpx.AsyncClient(
+                transport=httpx.ASGITransport(app=notes_main.app), base_url="http://notes.bench"
+            ))
+
+            bench = Bench(auth, notes, args.seed)
+            started = time.perf_counter()
+            await bench.seed(args.users, args.notes)
+            seed_seconds = time.perf_counter() - started
+
+            results = []
+            for name in args.workloads:
+                result = await run_workload(bench, name, args.requests, args.concurrency)
+                print(
+                    f"{name:>8}: {result['throughput_rps']:>8} rps  p50 {result['p50_ms']} ms  "
+                    f"p99 {result['p99_ms']} ms  errors {result['errors']}",
+                    file=sys.stderr,
+                )
+                results.append(result)
+
+            return {
+                "config": {
+                    "users": args.users,
+                    "notes_per_user": args.notes,
+                    "requests": args.requests,
+                    "concurrency": args.concurrency,
+                    "bcrypt_rounds": args.bcrypt_rounds,
+                    "seed": args.seed,
+                },
+                "environment": {
+                    "python": platform.python_version(),
+                    "platform": platform.platform(),
+                },
+                "seed_seconds": round(seed_seconds, 3),
+                "auth_client_cache": notes_main.notes.auth_client.cache_stats(),
+                "results": results,
+            }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=20, help="Seeded users")
+    parser.add_argument("--notes", type=int, default=50, help="Seeded notes per user")
+    parser.add_argument("--requests", type=int, default=500, help="Requests per workload")
+    parser.add_argument("--concurrency", type=int, default=10, help="Concurrent clients per workload")
+    parser.add_argument(
+        "--bcrypt-rounds", type=int, default=4,
+        help="bcrypt work factor (low by default so signup/token measure the service, not bcrypt)",
+    )
+    parser.add_argument("--seed", type=int, default=0, help="Random seed for request mix")
+    parser.add_argument(
+        "--workloads", nargs="+", choices=WORKLOADS, default=list(WORKLOADS),
+        help="Workloads to run, in order (delete reuses notes from create)",
+    )
+    parser.add_argument("--output", help="Also write the JSON report to this file")
+    args = parser.parse_args()
+
+    report = asyncio.run(main(args))
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
@@ -0,0 +1,88 @@
+"""Micro-benchmark of note list serialization at 10, 1k and 10k notes
+
+Compares FastAPI's default response_model path (validate, convert to
+jsonable Python, stdlib json.dumps) with the fast path used when
+``fast_serialization`` is enabled (prebuilt TypeAdapter straight to JSON
+bytes), plus orjson over the jsonable Python for reference.
+
+Run from this directory:
+
+    uv run python serialization.py
+"""
+import argparse
+import json
+import os
+import sys
+import timeit
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "services", "notes"))
+
+from app.schemas.notes import note_list_adapter  # noqa: E402
+
+SIZES = (10, 1_000, 10_000)
+
+
+def make_rows(count: int):
+    """ORM-like objects, as returned by the notes service layer"""
+    now = datetime(2024, 1, 1)
+    return [
+        SimpleNamespace(
+            id=i,
+            user_id=1,
+            title=f"Note {i}",
+            content="Lorem ipsum dolor sit amet, consectetur adipiscing elit. " * 8,
+            created_at=now,
+            updated_at=now + timedelta(seconds=i),
+        )
+        for i in range(count)
+    ]
+
+
+def default_path(rows) -> bytes:
+    models = note_list_adapter.validate_python(rows, from_attributes=True)
+    jsonable = note_list_adapter.dump_python(models, mode="json")
+    return json.dumps(jsonable, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode()
+
+
+def orjson_path(rows) -> bytes:
+    models = note_list_adapter.validate_python(rows, from_attributes=True)
+    return orjson.dumps(note_list_adapter.dump_python(models, mode="json"))
+
+
+def fast_path(rows) -> bytes:
+    return note_list_adapter.dump_json(note_list_adapter.validate_python(rows, from_attributes=True))
+
+
+def main(repeat: int) -> None:
+    paths = {"default": default_path, "fast": fast_path}
+    if orjson is not None:
+        paths["orjson"] = orjson_path
+
+    results = []
+    for size in SIZES:
+        rows = make_rows(size)
+        number = max(1, 10_000 // size)
+        for name, fn in paths.items():
+            best = min(timeit.repeat(lambda: fn(rows), number=number, repeat=repeat)) / number
+            results.append({
+                "notes": size,
+                "path": name,
+                "ms_per_list": round(best * 1000, 4),
+                "us_per_note": round(best * 1_000_000 / size, 3),
+            })
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    main(args.repeat)
@@ -0,0 +1,23 @@
+"""Latency/throughput summaries shared by the benchmark scripts"""
+import statistics
+from typing import Dict, List
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(len(sorted_values) * fraction))
+    return sorted_values[index]
+
+
+def summarize(latencies_ms: List[float], elapsed_seconds: float) -> Dict[str, float]:
+    """Throughput and mean/p50/p95/p99 latency for one workload run"""
+    values = sorted(latencies_ms)
+    return {
+        "throughput_rps": round(len(values) / elapsed_seconds, 1) if elapsed_seconds else 0.0,
+        "mean_ms": round(statistics.fmean(values), 3) if values else 0.0,
+        "p50_ms": round(percentile(values, 0.50), 3),
+        "p95_ms": round(percentile(values, 0.95), 3),
+        "p99_ms": round(percentile(values, 0.99), 3),
+    }
@@ -0,0 +1,141 @@
+"""Per-endpoint SQL query budgets for the auth and notes services
+
+Boots both apps in-process on throwaway SQLite files, as loadtest.py does,
+sends one request to each endpoint and fails if the services report (in
+X-DB-Query-Count) more SQL statements than the endpoint's budget. Raise a
+budget only when an endpoint genuinely needs another query. Run from this
+directory:
+
+    uv run pytest test_query_budgets.py
+"""
+import tempfile
+from contextlib import AsyncExitStack
+from typing import Awaitable, Callable, Dict, Tuple
+
+import httpx
+import pytest
+
+from loadtest import Bench, configure_environment, load_app
+from shared.query_budget import assert_query_budget
+
+Request = Callable[[Bench], Awaitable[httpx.Response]]
+
+
+def _user(bench: Bench) -> dict:
+    return bench.users[0]
+
+
+def _note_id(bench: Bench, index: int = 0) -> int:
+    return _user(bench)["note_ids"][index]
+
+
+async def _patch(bench: Bench) -> httpx.Response:
+    user, note_id = _user(bench), _note_id(bench, 1)
+    note = (await bench.notes.get(f"/note/notes/{note_id}", headers=user["headers"])).json()
+    return await bench.notes.patch(
+        f"/note/notes/{note_id}",
+        json={"version": note["version"], "edits": [{"offset": 0, "delete": 0, "insert": "Patched "}]},
+        headers=user["headers"],
+    )
+
+
+async def _list_not_modified(bench: Bench) -> httpx.Response:
+    headers = _user(bench)["headers"]
+    etag = (await bench.notes.get("/note/notes", headers=headers)).headers["etag"]
+    return await bench.notes.get("/note/notes", headers={**headers, "If-None-Match": etag})
+
+
+async def _refresh(bench: Bench) -> httpx.Response:
+    tokens = (await bench.login(_user(bench)["username"])).json()
+    return await bench.auth.post("/auth/refresh", params={"refresh_token": tokens["refresh_token"]})
+
+
+async def _logout(bench: Bench) -> httpx.Response:
+    tokens = (await bench.login(_user(bench)["username"])).json()
+    return await bench.auth.post("/auth/logout", params={"refresh_token": tokens["refresh_token"]})
+
+
+# "METHOD /path" -> (most SQL statements one request may run, the request).
+# Requests that need setup make it first; only the last response is checked.
+QUERY_BUDGETS: Dict[str, Tuple[int, Request]] = {
+    "POST /auth/signup": (3, lambda bench: bench.signup("budget-signup")),
+    "POST /auth/token": (1, lambda bench: bench.login(_user(bench)["username"])),
+    "POST /auth/refresh": (1, _refresh),
+    "POST /auth/logout": (1, _logout),
+    "GET /auth/validate": (0, lambda bench: bench.auth.get(
+        "/auth/validate", params={"token": _user(bench)["token"]}
+    )),
+    "GET /auth/profile": (0, lambda bench: bench.auth.get("/auth/profile", headers=_user(bench)["headers"])),
+    "GET /note/notes": (2, lambda bench: bench.notes.get("/note/notes", headers=_user(bench)["headers"])),
+    "GET /note/notes (not modified)": (1, _list_not_modified),
+    "GET /note/notes?fields=summary": (2, lambda bench: bench.notes.get(
+        "/note/notes", params={"fields": "summary"}, headers=_user(bench)["headers"]
+    )),
+    "GET /note/notes/search": (1, lambda bench: bench.notes.get(
+        "/note/notes/search", params={"q": "Seeded"}, headers=_user(bench)["headers"]
+    )),
+    "GET /note/notes/changes": (2, lambda bench: bench.notes.get(
+        "/note/notes/changes", headers=_user(bench)["headers"]
+    )),
+    "GET /note/notes/{note_id}": (1, lambda bench: bench.notes.get(
+        f"/note/notes/{_note_id(bench)}", headers=_user(bench)["headers"]
+    )),
+    "POST /note/notes": (5, lambda bench: bench.run_create(0)),
+    "POST /note/notes/bulk": (8, lambda bench: bench.notes.post("/note/notes/bulk", json={"operations": [
+        {"op": "create", "title": "Bulk", "content": "Bulk note"},
+        {"op": "update", "id": _note_id(bench, 2), "title": "Bulk update"},
+        {"op": "delete", "id": _note_id(bench, 3)},
+    ]}, headers=_user(bench)["headers"])),
+    "PUT /note/notes/{note_id}": (6, lambda bench: bench.notes.put(
+        f"/note/notes/{_note_id(bench)}",
+        json={"id": _note_id(bench), "title": "Updated", "content": "Updated body"},
+        headers=_user(bench)["headers"],
+    )),
+    "PATCH /note/notes/{note_id}": (5, _patch),
+    "POST /note/notes/import": (5, lambda bench: bench.notes.post(
+        "/note/notes/import",
+        content=b'{"title": "Imported", "content": "One"}\n{"title": "Imported", "content": "Two"}\n',
+        headers=_user(bench)["headers"],
+    )),
+    "DELETE /note/notes/{note_id}": (4, lambda bench: bench.notes.delete(
+        f"/note/notes/{_note_id(bench, 4)}", headers=_user(bench)["headers"]
+    )),
+}
+
+
+@pytest.fixture(scope="module")
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture(scope="module")
+async def bench():
+    with tempfile.TemporaryDirectory(prefix="jarvis-budgets-") as workdir:
+        configure_environment(bcrypt_rounds=4)
+        auth_main = load_app("auth", workdir)
+        notes_main = load_app("notes", workdir)
+        notes_main.notes.auth_client.client.transport = httpx.ASGITransport(app=auth_main.app)
+
+        async with AsyncExitStack() as stack:
+            for service in (auth_main, notes_main):
+                await stack.enter_async_context(service.app.router.lifespan_context(service.app))
+            auth = await stack.enter_async_context(httpx.AsyncClient(
+                transport=httpx.ASGITransport(app=auth_main.app), base_url="http://auth.bench"
+            ))
+            notes = await stack.enter_async_context(httpx.AsyncClient(
+                transport=httpx.ASGITransport(app=notes_main.app), base_url="http://notes.bench"
+            ))
+            bench = Bench(auth, notes, seed=0)
+            await bench.seed(users=1, notes_per_user=8)
+            # Warm the notes service's token cache so budgets measure the endpoint
+            (await bench.run_list(0)).raise_for_status()
+            yield bench
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("endpoint", list(QUERY_BUDGETS))
+async def test_query_budget(bench: Bench, endpoint: str):
+    budget, request = QUERY_BUDGETS[endpoint]
+    response = await request(bench)
+    assert response.status_code < 400, response.text
+    assert_query_budget(response, budget)
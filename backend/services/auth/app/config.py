@@ -1,3 +1,5 @@
+from typing import Dict, List, Optional
+
 from pydantic import Field
 from shared.config import BaseServiceSettings
 
@@ -10,7 +12,15 @@ class AuthServiceSettings(BaseServiceSettings):
     )
     jwt_algorithm: str = Field(
         default="HS256",
-        description="Algorithm for JWT token signing"
+        description="Algorithm for JWT token signing: HS256, or RS256/ES256 to let other services verify tokens locally"
+    )
+    jwt_signing_keys_dir: Optional[str] = Field(
+        default=None,
+        description="Directory of PEM private keys for RS/ES algorithms; the last by file name signs, all are published"
+    )
+    jwks_max_age_seconds: int = Field(
+        default=300,
+        description="Cache-Control max-age of the published JWK Set"
     )
     access_token_expire_minutes: int = Field(
         default=30,
@@ -20,6 +30,89 @@ class AuthServiceSettings(BaseServiceSettings):
         default=30,
         description="Refresh token expiration time in days"
     )
+    refresh_token_reuse_grace_seconds: float = Field(
+        default=5.0,
+        description="Seconds a rotated refresh token may be presented again and get the same successor, e.g. by parallel refreshes"
+    )
+
+    # Token revocation settings
+    revocation_reload_interval_seconds: float = Field(
+        default=5.0,
+        description="Seconds between loads of other replicas' token revocations (0 disables)"
+    )
+    revocation_reload_overlap_seconds: float = Field(
+        default=30.0,
+        description="Seconds each reload re-reads before the last seen revocation, for late commits and clock skew"
+    )
+    revocation_purge_interval_seconds: float = Field(
+        default=3600.0,
+        description="Seconds between deletions of revocations whose tokens have all expired"
+    )
+
+    # Password hashing settings
+    bcrypt_rounds: int = Field(
+        default=12,
+        description="bcrypt work factor; hashes with a different factor are rehashed on login"
+    )
+    password_hash_executor: str = Field(
+        default="thread",
+        description="Pool used for password hashing: 'thread' or 'process'"
+    )
+    password_hash_workers: int = Field(
+        default=2,
+        description="Number of workers in the password hashing pool"
+    )
+    password_hash_max_pending: int = Field(
+        default=32,
+        description="Queued or running hash jobs before requests are rejected with 503"
+    )
+
+    # Admission control for the bcrypt-heavy routes
+    rate_limit_enabled: bool = Field(
+        default=True,
+        description="Rate limit and cap concurrency of the routes in rate_limits"
+    )
+    rate_limits: Dict[str, str] = Field(
+        default={"/token": "10/minute", "/signup": "5/minute"},
+        description="Per-route limits as '<count>/<second|minute|hour>', applied per username (and per client IP with rate_limit_per_ip)"
+    )
+    rate_limit_user_max_delay_seconds: float = Field(
+        default=2.0,
+        description="Longest delay added to a request whose username is over its limit (0 disables per-username limits)"
+    )
+    rate_limit_max_concurrency: int = Field(
+        default=16,
+        description="Rate-limited requests handled at once before new ones are shed with 503 (0 disables)"
+    )
+    rate_limit_per_ip: bool = Field(
+        default=False,
+        description="Also limit per client IP; enable only if clients connect directly or every proxy in front (the frontend server too) is in rate_limit_trusted_proxies"
+    )
+    rate_limit_trusted_proxies: List[str] = Field(
+        default=[],
+        description="Addresses or CIDR ranges of proxies whose X-Forwarded-For header gives the client IP"
+    )
+
+    # User lookup cache settings. In production with several replicas use
+    # 'shared' with user_cache_redis_url, so an invalidation reaches every
+    # replica; 'local' suits a single replica (others would serve stale
+    # entries until the TTL runs out)
+    user_cache_backend: str = Field(
+        default="local",
+        description="User cache backend: 'local' (per process), 'shared' (Redis, needs user_cache_redis_url; use with several replicas) or 'none'"
+    )
+    user_cache_redis_url: Optional[str] = Field(
+        default=None,
+        description="Redis URL for the shared user cache, e.g. redis://redis:6379/0"
+    )
+    user_cache_ttl_seconds: float = Field(
+        default=60.0,
+        description="Seconds a cached user lookup stays valid (0 disables the cache)"
+    )
+    user_cache_max_entries: int = Field(
+        default=10000,
+        description="Maximum number of users kept in the local cache"
+    )
 
     # Cookie security settings
     cookie_secure: bool = Field(
@@ -2,7 +2,7 @@ from shared.database import create_database_engine, create_session_local, get_da
 from ..config import settings
 
 # Create engine and session
-engine = create_database_engine(settings.database_url)
+engine = create_database_engine(settings.database_url, **settings.database_engine_options)
 SessionLocal = create_session_local(engine)
 
 # Create database dependency
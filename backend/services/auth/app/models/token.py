@@ -0,0 +1,12 @@
+from sqlalchemy import Column, String, DateTime
+from datetime import datetime, timezone
+from .db import Base
+
+class RevokedToken(Base):
+    """A revoked token id (jti) or token family, kept until its tokens would expire"""
+    __tablename__ = "revoked_tokens"
+
+    key = Column(String, primary_key=True)
+    reason = Column(String, nullable=False)
+    expires_at = Column(DateTime, nullable=False, index=True)
+    revoked_at = Column(DateTime, nullable=False, index=True, default=lambda: datetime.now(timezone.utc))
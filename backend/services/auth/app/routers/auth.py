@@ -1,23 +1,31 @@
 from datetime import timedelta
 from typing import Annotated
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Response, status
+from fastapi.concurrency import run_in_threadpool
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy.orm import Session
 
-from shared.schemas.user import UserResponse
+from shared.schemas.user import UserResponse, user_response_adapter
+from shared.serialization import model_response
 
 from ..models.db import get_db
-from ..models.user import User
 from ..services.auth import (
     authenticate_user,
     create_access_token,
     create_refresh_token,
+    create_user,
+    decode_token,
+    get_cached_user,
     get_current_user_from_token,
-    get_password_hash,
     verify_token,
-    get_user_by_username
+    get_user_by_username,
+    user_claims,
+    validate_access_token
 )
+from ..services.hashing import password_hasher
+from ..services.keys import key_ring
+from ..services.revocation import LOGOUT, consume_refresh_token, derive_token_id, legacy_token_key, new_token_id, revoke_family
 from ..config import settings
 from ..schemas.user import AuthResponse, UserSignupRequest, TokenResponse
 
@@ -26,39 +34,32 @@ router = APIRouter(
 )
 
 @router.post("/signup", response_model=AuthResponse)
-def signup(
+async def signup(
     user_data: UserSignupRequest,
     db: Session = Depends(get_db)
 ):
     # Check if user already exists
-    existing_user = db.query(User).filter(User.username == user_data.username).first()
+    existing_user = await run_in_threadpool(get_user_by_username, db, user_data.username)
     if existing_user:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Username already registered"
         )
 
-    # Create new user
-    hashed_password = get_password_hash(user_data.password)
-    new_user = User(
-        username=user_data.username,
-        hashed_password=hashed_password,
-        first_name=user_data.first_name,
+    # Hash on the dedicated hashing pool so bcrypt cannot starve other routes
+    hashed_password = await password_hasher.hash(user_data.password)
+    new_user = await run_in_threadpool(
+        create_user, db, user_data.username, hashed_password, user_data.first_name
     )
-    db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
 
     return AuthResponse(message="User created successfully", user_id=new_user.id)
 
 @router.post("/token", response_model=TokenResponse)
-def login_for_access_token(
+async def login_for_access_token(
     form_data: Annotated[OAuth2PasswordRequestForm, Depends()],
     db: Session = Depends(get_db)
 ):
-    print("login req")
-    print(form_data)
-    user = authenticate_user(db, form_data.username, form_data.password)
+    user = await authenticate_user(db, form_data.username, form_data.password)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -69,11 +70,14 @@ def login_for_access_token(
     access_token_expires = timedelta(minutes=settings.access_token_expire_minutes)
     refresh_token_expires = timedelta(days=settings.refresh_token_expire_days)
 
+    # Every token rotated from this login shares a family id, so a logout or
+    # a detected refresh token reuse can revoke them together
+    claims = {"sub": user.username, "fam": new_token_id()}
     access_token = create_access_token(
-        data={"sub": user.username}, expires_delta=access_token_expires
+        data={**claims, **user_claims(user)}, expires_delta=access_token_expires
     )
     refresh_token = create_refresh_token(
-        data={"sub": user.username}, expires_delta=refresh_token_expires
+        data=claims, expires_delta=refresh_token_expires
     )
 
     return TokenResponse(
@@ -94,11 +98,20 @@ def refresh_access_token(
         headers={"WWW-Authenticate": "Bearer"},
     )
 
-    username = verify_token(refresh_token, "refresh")
-    if username is None:
+    payload = decode_token(refresh_token, "refresh")
+    if payload is None:
         raise credentials_exception
 
-    user = get_user_by_username(db, username)
+    # Refresh tokens are single use; tokens issued before rotation existed
+    # carry no jti, so they are tracked by hash and start a family here
+    key = payload.get("jti") or legacy_token_key(refresh_token)
+    family = payload.get("fam") or derive_token_id(key, "family")
+    if not consume_refresh_token(
+        db, key, family, payload["exp"], settings.refresh_token_reuse_grace_seconds
+    ):
+        raise credentials_exception
+
+    user = get_cached_user(db, payload["sub"])
     if user is None:
         raise credentials_exception
 
@@ -106,11 +119,12 @@ def refresh_access_token(
     access_token_expires = timedelta(minutes=settings.access_token_expire_minutes)
     refresh_token_expires = timedelta(days=settings.refresh_token_expire_days)
 
+    claims = {"sub": user.username, "fam": family}
     new_access_token = create_access_token(
-        data={"sub": user.username}, expires_delta=access_token_expires
+        data={**claims, **user_claims(user)}, expires_delta=access_token_expires
     )
     new_refresh_token = create_refresh_token(
-        data={"sub": user.username}, expires_delta=refresh_token_expires
+        data=claims, expires_delta=refresh_token_expires, token_id=derive_token_id(key, "successor")
     )
 
     return TokenResponse(
@@ -120,8 +134,27 @@ def refresh_access_token(
         expires_in=settings.access_token_expire_minutes * 60
     )
 
+@router.post("/logout", response_model=AuthResponse)
+def logout(
+    refresh_token: str,
+    db: Session = Depends(get_db)
+):
+    """Revoke the refresh token and every token rotated from the same login"""
+    payload = decode_token(refresh_token, "refresh")
+    if payload is None or payload.get("fam") is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+    revoke_family(db, payload["fam"], LOGOUT)
+    return AuthResponse(message="Logged out successfully")
+
 @router.get("/profile", response_model=UserResponse)
-def get_profile(current_user: User = Depends(get_current_user_from_token)):
+def get_profile(current_user: UserResponse = Depends(get_current_user_from_token)):
+    if settings.fast_serialization:
+        return model_response(user_response_adapter, current_user)
     return UserResponse(
         id=current_user.id,
         username=current_user.username,
@@ -132,23 +165,24 @@ def get_profile(current_user: User = Depends(get_current_user_from_token)):
 @router.get("/validate", response_model=UserResponse)
 def validate_token(token: str, db: Session = Depends(get_db)):
     """Internal endpoint for other services to validate tokens"""
-    username = verify_token(token)
-    if username is None:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid token"
-        )
-
-    user = get_user_by_username(db, username)
+    user = validate_access_token(db, token)
     if user is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="User not found"
+            detail="Invalid token"
         )
 
+    if settings.fast_serialization:
+        return model_response(user_response_adapter, user)
     return UserResponse(
         id=user.id,
         username=user.username,
         first_name=user.first_name,
         created_at=user.created_at
-    )
\ No newline at end of file
+    )
+
+@router.get("/.well-known/jwks.json")
+def jwks(response: Response):
+    """Public keys for verifying access tokens without calling /validate"""
+    response.headers["Cache-Control"] = f"public, max-age={settings.jwks_max_age_seconds}"
+    return key_ring.jwks()
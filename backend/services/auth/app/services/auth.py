@@ -1,23 +1,29 @@
 from datetime import datetime, timedelta, timezone
 from typing import Optional, Annotated
-from jose import JWTError, jwt
-from passlib.context import CryptContext
+from jose import JWTError
 from fastapi import Depends, HTTPException, status, Request
+from fastapi.concurrency import run_in_threadpool
 from fastapi.security import OAuth2PasswordBearer, HTTPBearer
 from sqlalchemy.orm import Session
 from ..models.db import get_db
 from ..models.user import User
 from ..config import settings
+from shared.schemas.user import UserResponse
+from .hashing import password_hasher
+from .user_cache import user_cache
+from .keys import key_ring
+from .revocation import new_token_id, revocation_index
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/token")
 security = HTTPBearer(auto_error=False)
 
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
-
-def get_password_hash(password: str) -> str:
-    return pwd_context.hash(password)
+def user_claims(user) -> dict:
+    """Identity claims that let other services build a UserResponse from an access token"""
+    return {
+        "uid": user.id,
+        "first_name": user.first_name,
+        "created_at": user.created_at.isoformat() if user.created_at else None,
+    }
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
@@ -30,12 +36,12 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode.update({
         "exp": expire,
         "iat": now,
+        "jti": new_token_id(),
         "type": "access"
     })
-    encoded_jwt = jwt.encode(to_encode, settings.jwt_secret_key, algorithm=settings.jwt_algorithm)
-    return encoded_jwt
+    return key_ring.encode(to_encode)
 
-def create_refresh_token(data: dict, expires_delta: Optional[timedelta] = None):
+def create_refresh_token(data: dict, expires_delta: Optional[timedelta] = None, token_id: Optional[str] = None):
     to_encode = data.copy()
     now = datetime.now(timezone.utc)
     if expires_delta:
@@ -46,32 +52,84 @@ def create_refresh_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode.update({
         "exp": expire,
         "iat": now,
+        "jti": token_id or new_token_id(),
         "type": "refresh"
     })
-    encoded_jwt = jwt.encode(to_encode, settings.jwt_secret_key, algorithm=settings.jwt_algorithm)
-    return encoded_jwt
+    return key_ring.encode(to_encode)
 
-def verify_token(token: str, token_type: str = "access") -> Optional[str]:
+def decode_token(token: str, token_type: str = "access") -> Optional[dict]:
+    """Return the claims of a valid, unrevoked token of ``token_type``"""
     try:
-        payload = jwt.decode(token, settings.jwt_secret_key, algorithms=[settings.jwt_algorithm])
-        username: str = payload.get("sub")
-        token_type_claim: str = payload.get("type")
-
-        if username is None or token_type_claim != token_type:
-            return None
-        return username
+        payload = key_ring.decode(token)
     except JWTError:
         return None
 
+    if payload.get("sub") is None or payload.get("type") != token_type:
+        return None
+    # Refresh token reuse is detected by consume_refresh_token, so only the
+    # family is checked here
+    jti = payload.get("jti") if token_type == "access" else None
+    if revocation_index.is_revoked(jti, payload.get("fam")):
+        return None
+    return payload
+
+def verify_token(token: str, token_type: str = "access") -> Optional[str]:
+    payload = decode_token(token, token_type)
+    if payload is None:
+        return None
+    return payload["sub"]
+
 def get_user_by_username(db: Session, username: str) -> Optional[User]:
     return db.query(User).filter(User.username == username).first()
 
-def authenticate_user(db: Session, username: str, password: str) -> Optional[User]:
+def get_cached_user(db: Session, username: str) -> Optional[UserResponse]:
+    """Read-through lookup of a user's public fields via the user cache"""
+    cached = user_cache.get(username)
+    if cached is not None:
+        return cached
+
     user = get_user_by_username(db, username)
+    if user is None:
+        return None
+    cached = UserResponse.model_validate(user)
+    user_cache.set(cached)
+    return cached
+
+def validate_access_token(db: Session, token: str) -> Optional[UserResponse]:
+    """Return the user a valid access token belongs to, or None (what /validate checks)"""
+    username = verify_token(token, "access")
+    if username is None:
+        return None
+    return get_cached_user(db, username)
+
+def create_user(db: Session, username: str, hashed_password: str, first_name: str) -> User:
+    new_user = User(
+        username=username,
+        hashed_password=hashed_password,
+        first_name=first_name,
+    )
+    db.add(new_user)
+    db.commit()
+    db.refresh(new_user)
+    user_cache.invalidate(username)
+    return new_user
+
+def update_password_hash(db: Session, user: User, hashed_password: str) -> None:
+    user.hashed_password = hashed_password
+    db.commit()
+    user_cache.invalidate(user.username)
+
+async def authenticate_user(db: Session, username: str, password: str) -> Optional[User]:
+    """Verify credentials on the hashing pool, upgrading outdated hashes"""
+    user = await run_in_threadpool(get_user_by_username, db, username)
     if not user:
         return None
-    if not verify_password(password, user.hashed_password):
+
+    valid, new_hash = await password_hasher.verify_and_rehash(password, user.hashed_password)
+    if not valid:
         return None
+    if new_hash is not None:
+        await run_in_threadpool(update_password_hash, db, user, new_hash)
     return user
 
 def get_current_user(request: Request, db: Session = Depends(get_db)) -> User:
@@ -99,7 +157,7 @@ def get_current_user(request: Request, db: Session = Depends(get_db)) -> User:
 
     return user
 
-def get_current_user_from_token(token: Annotated[str, Depends(oauth2_scheme)], db: Session = Depends(get_db)) -> User:
+def get_current_user_from_token(token: Annotated[str, Depends(oauth2_scheme)], db: Session = Depends(get_db)) -> UserResponse:
     """OAuth2 compliant function for bearer token authentication"""
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
@@ -111,7 +169,7 @@ def get_current_user_from_token(token: Annotated[str, Depends(oauth2_scheme)], d
     if username is None:
         raise credentials_exception
 
-    user = get_user_by_username(db, username)
+    user = get_cached_user(db, username)
     if user is None:
         raise credentials_exception
 
@@ -0,0 +1,127 @@
+import base64
+import hashlib
+import json
+import logging
+import os
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ec, rsa
+from jose import JWTError, jwk, jwt
+from jose.backends.base import Key
+
+from ..config import settings
+
+logger = logging.getLogger(__name__)
+
+# Curves for the ECDSA algorithms; python-jose has no EdDSA support
+EC_CURVES = {"ES256": ec.SECP256R1, "ES384": ec.SECP384R1, "ES512": ec.SECP521R1}
+RSA_ALGORITHMS = frozenset({"RS256", "RS384", "RS512"})
+ASYMMETRIC_ALGORITHMS = RSA_ALGORITHMS | frozenset(EC_CURVES)
+
+# JWK members that identify a public key (RFC 7638)
+_THUMBPRINT_MEMBERS = {"RSA": ("e", "kty", "n"), "EC": ("crv", "kty", "x", "y")}
+
+
+@dataclass
+class SigningKey:
+    kid: str
+    private_key: Key
+    public_key: Key
+    public_jwk: Dict[str, Any]
+
+
+def _thumbprint(public_jwk: Dict[str, Any]) -> str:
+    """RFC 7638 JWK thumbprint, used as the key id"""
+    members = {name: public_jwk[name] for name in _THUMBPRINT_MEMBERS[public_jwk["kty"]]}
+    digest = hashlib.sha256(json.dumps(members, separators=(",", ":"), sort_keys=True).encode()).digest()
+    return base64.urlsafe_b64encode(digest).decode().rstrip("=")
+
+
+def signing_key_from_pem(pem: str, algorithm: str) -> SigningKey:
+    private_key = jwk.construct(pem, algorithm)
+    public_key = private_key.public_key()
+    public_jwk = public_key.to_dict()
+    kid = _thumbprint(public_jwk)
+    return SigningKey(kid, private_key, public_key, {**public_jwk, "kid": kid, "use": "sig"})
+
+
+def generate_private_key_pem(algorithm: str) -> str:
+    if algorithm in RSA_ALGORITHMS:
+        private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    else:
+        private_key = ec.generate_private_key(EC_CURVES[algorithm]())
+    return private_key.private_bytes(
+        serialization.Encoding.PEM,
+        serialization.PrivateFormat.PKCS8,
+        serialization.NoEncryption(),
+    ).decode()
+
+
+def load_signing_keys(algorithm: str, keys_dir: Optional[str]) -> List[SigningKey]:
+    """Load the *.pem private keys in ``keys_dir``, in file name order
+
+    Without a directory a key is generated for this process, which only
+    works while there is a single auth replica.
+    """
+    if not keys_dir:
+        logger.warning("jwt_signing_keys_dir is not set; using a generated %s key for this process", algorithm)
+        return [signing_key_from_pem(generate_private_key_pem(algorithm), algorithm)]
+
+    names = sorted(name for name in os.listdir(keys_dir) if name.endswith(".pem"))
+    if not names:
+        raise ValueError(f"No .pem signing keys in {keys_dir}")
+    keys = []
+    for name in names:
+        with open(os.path.join(keys_dir, name)) as f:
+            keys.append(signing_key_from_pem(f.read(), algorithm))
+    return keys
+
+
+class KeyRing:
+    """Signs and verifies JWTs with the shared secret or a set of asymmetric keys
+
+    With an asymmetric algorithm the last key signs and every key still
+    verifies, so a new key can be rolled out before old tokens expire.
+    Tokens carry the signing key's id in the ``kid`` header.
+    """
+
+    def __init__(self, algorithm: str, secret: str, keys: List[SigningKey]):
+        self.algorithm = algorithm
+        self.secret = secret
+        self.keys = keys
+        self._public_keys = {key.kid: key.public_key for key in keys}
+
+    @property
+    def asymmetric(self) -> bool:
+        return self.algorithm in ASYMMETRIC_ALGORITHMS
+
+    def encode(self, claims: Dict[str, Any]) -> str:
+        if not self.asymmetric:
+            return jwt.encode(claims, self.secret, algorithm=self.algorithm)
+        signer = self.keys[-1]
+        return jwt.encode(claims, signer.private_key, algorithm=self.algorithm, headers={"kid": signer.kid})
+
+    def decode(self, token: str) -> Dict[str, Any]:
+        """Verify a token's signature and expiry, raising JWTError if invalid"""
+        if not self.asymmetric:
+            return jwt.decode(token, self.secret, algorithms=[self.algorithm])
+        key = self._public_keys.get(jwt.get_unverified_header(token).get("kid"))
+        if key is None:
+            raise JWTError("Unknown signing key")
+        return jwt.decode(token, key, algorithms=[self.algorithm])
+
+    def jwks(self) -> Dict[str, Any]:
+        """Public keys as a JWK Set (empty for a shared secret)"""
+        return {"keys": [key.public_jwk for key in self.keys]}
+
+
+def create_key_ring() -> KeyRing:
+    keys = []
+    if settings.jwt_algorithm in ASYMMETRIC_ALGORITHMS:
+        keys = load_signing_keys(settings.jwt_algorithm, settings.jwt_signing_keys_dir)
+    return KeyRing(settings.jwt_algorithm, settings.jwt_secret_key, keys)
+
+
+key_ring = create_key_ring()
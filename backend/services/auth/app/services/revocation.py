@@ -0,0 +1,213 @@
+import asyncio
+import hashlib
+import heapq
+import logging
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import delete, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from ..config import settings
+from ..models.token import RevokedToken
+
+logger = logging.getLogger(__name__)
+
+# RevokedToken.reason values
+ROTATED = "rotated"
+LOGOUT = "logout"
+REUSE_DETECTED = "reuse_detected"
+
+
+def new_token_id() -> str:
+    return uuid.uuid4().hex
+
+
+def derive_token_id(key: str, purpose: str) -> str:
+    """A token id fixed by ``key``, so retried rotations of one token issue the same ids"""
+    return hashlib.sha256(f"{purpose}:{key}".encode()).hexdigest()[:32]
+
+
+def legacy_token_key(token: str) -> str:
+    """Revocation key for a refresh token issued before tokens carried a jti"""
+    return "legacy:" + hashlib.sha256(token.encode()).hexdigest()
+
+
+def _timestamp(value: datetime) -> float:
+    # SQLite hands DateTime values back naive; they are stored as UTC
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+
+class RevocationIndex:
+    """In-process set of revoked token ids and families, each kept until it expires
+
+    Lookups are a lock-free dict read so they can sit on every token check;
+    entries are evicted in expiry order once no token they cover can still
+    be valid. Writes take a lock since handlers run in a threadpool.
+    """
+
+    def __init__(self):
+        self._expiry: Dict[str, float] = {}
+        self._heap: List[Tuple[float, str]] = []
+        self._lock = threading.Lock()
+        self.watermark: Optional[datetime] = None
+        self.evictions = 0
+        self.reloads = 0
+
+    def __len__(self) -> int:
+        return len(self._expiry)
+
+    def contains(self, key: Optional[str]) -> bool:
+        if key is None:
+            return False
+        expires_at = self._expiry.get(key)
+        return expires_at is not None and expires_at > time.time()
+
+    def is_revoked(self, jti: Optional[str], family: Optional[str]) -> bool:
+        return self.contains(jti) or self.contains(family)
+
+    def add(self, key: str, expires_at: float) -> None:
+        if expires_at <= time.time():
+            return
+        with self._lock:
+            if self._expiry.get(key, 0.0) >= expires_at:
+                return
+            self._expiry[key] = expires_at
+            heapq.heappush(self._heap, (expires_at, key))
+
+    def evict_expired(self) -> int:
+        """Drop entries whose tokens have all expired; returns how many"""
+        now = time.time()
+        evicted = 0
+        with self._lock:
+            while self._heap and self._heap[0][0] <= now:
+                expires_at, key = heapq.heappop(self._heap)
+                # Skip stale heap entries for keys re-added with a later expiry
+                if self._expiry.get(key) == expires_at:
+                    del self._expiry[key]
+                    evicted += 1
+            self.evictions += evicted
+        return evicted
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self._expiry),
+            "evictions": self.evictions,
+            "reloads": self.reloads,
+            "watermark": self.watermark.isoformat() if self.watermark else None,
+        }
+
+
+revocation_index = RevocationIndex()
+
+
+def revoke(db: Session, key: str, reason: str, expires_at: datetime) -> bool:
+    """Persist a revocation and add it to the local index
+
+    Returns False if ``key`` was already revoked; the first writer wins, so
+    concurrent rotations of one refresh token cannot both succeed.
+    """
+    db.add(RevokedToken(key=key, reason=reason, expires_at=expires_at))
+    try:
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        revocation_index.add(key, _timestamp(expires_at))
+        return False
+    revocation_index.add(key, _timestamp(expires_at))
+    return True
+
+
+def revoke_family(db: Session, family: str, reason: str) -> None:
+    """Revoke every token issued from one login, including ones not yet seen"""
+    # Any token in the family was issued by now, so none outlives this
+    expires_at = datetime.now(timezone.utc) + timedelta(days=settings.refresh_token_expire_days)
+    revoke(db, family, reason, expires_at)
+
+
+def _rotated_within(db: Session, key: str, grace: float) -> bool:
+    row = db.execute(
+        select(RevokedToken.reason, RevokedToken.revoked_at).where(RevokedToken.key == key)
+    ).first()
+    return row is not None and row.reason == ROTATED and time.time() - _timestamp(row.revoked_at) <= grace
+
+
+def consume_refresh_token(db: Session, key: str, family: Optional[str], exp: int, grace: float = 0.0) -> bool:
+    """Mark a refresh token as used; returns False if it had been used before
+
+    A token rotated less than ``grace`` seconds ago is still accepted, so
+    parallel refreshes with one cookie don't log the user out; callers
+    issue the same successor id (see derive_token_id) for each. Later,
+    presenting a rotated refresh token again means it leaked (or a client
+    replayed it), so the whole family is revoked and the holder of the
+    newest token must log in again.
+    """
+    expires_at = datetime.fromtimestamp(exp, timezone.utc)
+    if not revocation_index.contains(key) and revoke(db, key, ROTATED, expires_at):
+        return True
+    if grace > 0 and _rotated_within(db, key, grace):
+        return True
+
+    logger.warning("Refresh token reuse detected for family %s", family)
+    if family is not None:
+        revoke_family(db, family, REUSE_DETECTED)
+    return False
+
+
+def load_revocations(db: Session, overlap: float) -> int:
+    """Add revocations recorded since the last load (all live ones on the first)
+
+    Re-reads ``overlap`` seconds before the watermark so rows committed late
+    or stamped by a replica with a slow clock are not missed.
+    """
+    query = select(RevokedToken.key, RevokedToken.expires_at, RevokedToken.revoked_at).where(
+        RevokedToken.expires_at > datetime.now(timezone.utc)
+    )
+    if revocation_index.watermark is not None:
+        query = query.where(RevokedToken.revoked_at > revocation_index.watermark - timedelta(seconds=overlap))
+
+    rows = db.execute(query).all()
+    for row in rows:
+        revocation_index.add(row.key, _timestamp(row.expires_at))
+        if revocation_index.watermark is None or row.revoked_at > revocation_index.watermark:
+            revocation_index.watermark = row.revoked_at
+    revocation_index.reloads += 1
+    revocation_index.evict_expired()
+    return len(rows)
+
+
+def purge_expired_revocations(db: Session) -> int:
+    """Delete revocations whose tokens have all expired; returns how many"""
+    result = db.execute(delete(RevokedToken).where(RevokedToken.expires_at <= datetime.now(timezone.utc)))
+    db.commit()
+    return result.rowcount
+
+
+def reload_revocations(session_factory, purge: bool = False) -> None:
+    """Load new revocations, and optionally purge expired ones, in a fresh session"""
+    with session_factory() as db:
+        load_revocations(db, settings.revocation_reload_overlap_seconds)
+        if purge:
+            purge_expired_revocations(db)
+
+
+async def reload_revocations_periodically(session_factory, interval: float, purge_interval: float) -> None:
+    """Pick up other replicas' revocations every ``interval`` seconds until cancelled"""
+    last_purge = time.monotonic()
+    while True:
+        await asyncio.sleep(interval)
+        purge = time.monotonic() - last_purge >= purge_interval
+        try:
+            await run_in_threadpool(reload_revocations, session_factory, purge)
+        except Exception:
+            logger.exception("Revocation reload failed")
+            continue
+        if purge:
+            last_purge = time.monotonic()
@@ -0,0 +1,106 @@
+import threading
+from typing import Any, Dict, Optional
+
+from shared.cache import RedisSharedCacheBackend, SharedCacheBackend, TTLCache
+from shared.schemas.user import UserResponse
+
+from ..config import settings
+
+
+class UserCache:
+    """Cache of UserResponse snapshots keyed by username
+
+    Handlers run in a threadpool, so implementations must be thread-safe.
+    """
+
+    def get(self, username: str) -> Optional[UserResponse]:
+        return None
+
+    def set(self, user: UserResponse) -> None:
+        pass
+
+    def invalidate(self, username: str) -> None:
+        pass
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": "none"}
+
+
+class LocalUserCache(UserCache):
+    """Bounded in-process LRU cache with a TTL"""
+
+    def __init__(self, max_entries: int, ttl: float):
+        self._cache = TTLCache(max_entries=max_entries, ttl=ttl)
+        self._lock = threading.Lock()
+
+    def get(self, username: str) -> Optional[UserResponse]:
+        with self._lock:
+            return self._cache.get(username)
+
+    def set(self, user: UserResponse) -> None:
+        with self._lock:
+            self._cache.set(user.username, user)
+
+    def invalidate(self, username: str) -> None:
+        with self._lock:
+            self._cache.delete(username)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"backend": "local", **self._cache.stats()}
+
+
+class SharedUserCache(UserCache):
+    """Cache stored in a SharedCacheBackend so replicas see each other's entries"""
+
+    key_prefix = "auth:user:"
+
+    def __init__(self, backend: SharedCacheBackend, ttl: float):
+        self.backend = backend
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, username: str) -> Optional[UserResponse]:
+        value = self.backend.get(self.key_prefix + username)
+        with self._lock:
+            if value is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return UserResponse.model_validate_json(value)
+
+    def set(self, user: UserResponse) -> None:
+        self.backend.set(self.key_prefix + user.username, user.model_dump_json().encode(), self.ttl)
+
+    def invalidate(self, username: str) -> None:
+        self.backend.delete(self.key_prefix + username)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "backend": "shared",
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+def create_user_cache(backend: str, max_entries: int, ttl: float, redis_url: Optional[str] = None) -> UserCache:
+    if ttl <= 0 or backend == "none":
+        return UserCache()
+    if backend == "shared":
+        if not redis_url:
+            raise ValueError("user_cache_backend 'shared' needs user_cache_redis_url")
+        return SharedUserCache(RedisSharedCacheBackend(redis_url), ttl)
+    return LocalUserCache(max_entries, ttl)
+
+
+user_cache = create_user_cache(
+    settings.user_cache_backend,
+    settings.user_cache_max_entries,
+    settings.user_cache_ttl_seconds,
+    settings.user_cache_redis_url,
+)
@@ -1,7 +1,49 @@
+import asyncio
+from contextlib import asynccontextmanager, suppress
+
 from fastapi import FastAPI
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse
 from app.routers import auth
-from app.models.db import create_tables
+from app.models.db import SessionLocal, create_tables, engine
+from app.services.hashing import password_hasher
+from app.services.revocation import reload_revocations, reload_revocations_periodically
+from app.services.user_cache import user_cache
 from app.config import settings
+from shared.compression import CompressionMiddleware
+from shared.database import pool_stats, warm_up_pool
+from shared.deadline import DeadlineMiddleware
+from shared.health import check_database_within, liveness_response, readiness_response
+from shared.metrics import CACHE_STATS, DB_POOL_STATS, MetricsMiddleware, metrics_endpoint
+from shared.query_budget import QueryStatsMiddleware
+from shared.rate_limit import RateLimitMiddleware, parse_rate_limit
+from shared.serialization import ORJSONResponse
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Prepare the database, warm pooled connections and load revocations, then mark ready"""
+    app.state.ready = False
+    if settings.db_create_tables:
+        create_tables()
+    await run_in_threadpool(warm_up_pool, engine, settings.db_warmup_connections)
+    await password_hasher.warm_up()
+    await run_in_threadpool(reload_revocations, SessionLocal, True)
+    reloader = None
+    if settings.revocation_reload_interval_seconds > 0:
+        reloader = asyncio.create_task(reload_revocations_periodically(
+            SessionLocal,
+            settings.revocation_reload_interval_seconds,
+            settings.revocation_purge_interval_seconds,
+        ))
+    app.state.ready = True
+    yield
+    app.state.ready = False
+    if reloader is not None:
+        reloader.cancel()
+        with suppress(asyncio.CancelledError):
+            await reloader
+    password_hasher.shutdown()
 
 
 app = FastAPI(
@@ -9,16 +51,59 @@ app = FastAPI(
     debug=settings.debug,
     ignore_trailing_slash=True,
     root_path="/auth",
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse if settings.fast_serialization else JSONResponse,
 )
 
-@app.on_event("startup")
-async def startup_event():
-    """Create database tables on startup"""
-    create_tables()
+if settings.compression_enabled:
+    app.add_middleware(
+        CompressionMiddleware,
+        minimum_size=settings.compression_minimum_size,
+        gzip_level=settings.compression_gzip_level,
+        brotli_quality=settings.compression_brotli_quality,
+    )
+
+if settings.rate_limit_enabled:
+    # Swap in a shared RateLimitBackend so replicas enforce one budget
+    app.add_middleware(
+        RateLimitMiddleware,
+        limits={route: parse_rate_limit(limit) for route, limit in settings.rate_limits.items()},
+        max_concurrency=settings.rate_limit_max_concurrency,
+        service="auth",
+        trusted_proxies=settings.rate_limit_trusted_proxies,
+        per_ip=settings.rate_limit_per_ip,
+        max_user_delay=settings.rate_limit_user_max_delay_seconds,
+    )
+
+app.add_middleware(DeadlineMiddleware, timeout=settings.request_timeout_seconds)
+
+if settings.debug or settings.query_stats_headers or settings.query_budgets:
+    app.add_middleware(
+        QueryStatsMiddleware,
+        headers=settings.debug or settings.query_stats_headers,
+        budgets=settings.query_budgets,
+    )
+
+# Added last so it is outermost and times the whole request, compression included
+if settings.metrics_enabled:
+    app.add_middleware(MetricsMiddleware, service="auth")
+    app.add_route("/metrics", metrics_endpoint, include_in_schema=False)
+    DB_POOL_STATS.add(lambda: pool_stats(engine), "auth")
+    CACHE_STATS.add(user_cache.stats, "auth", "user")
 
 # Include routers
 app.include_router(auth.router)
 
+@app.get("/healthz", include_in_schema=False)
+def healthz():
+    return liveness_response()
+
+@app.get("/readyz", include_in_schema=False)
+async def readyz():
+    return readiness_response(getattr(app.state, "ready", False), {
+        "database": await check_database_within(engine, settings.readiness_timeout_seconds),
+    })
+
 @app.get("/")
 def read_root():
     return {"service": settings.app_name}
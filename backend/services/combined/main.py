@@ -0,0 +1,85 @@
+"""Auth and notes in one process, for small and edge deployments
+
+Both services are mounted under their usual root paths (/auth and /note),
+so clients see the same URLs as with separate containers. Notes validates
+tokens by calling the auth service's code directly through an
+InProcessAuthClient instead of making a loopback HTTP call to
+/auth/validate. Settings for both services come from the environment (or
+.env.local in this directory), so they share one database. Run from this
+directory:
+
+    uv run fastapi run main.py
+"""
+import os
+from contextlib import AsyncExitStack, asynccontextmanager
+from typing import Optional
+
+from fastapi import FastAPI
+from fastapi.concurrency import run_in_threadpool
+
+from shared.auth_client import InProcessAuthClient
+from shared.health import liveness_response, readiness_response
+from shared.schemas.user import UserResponse
+from shared.services import load_service
+
+SERVICES_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Required by the notes settings, but auth calls never leave the process
+os.environ.setdefault("AUTH_SERVICE_URL", "http://127.0.0.1")
+
+auth = load_service("auth", SERVICES_DIR)
+notes = load_service("notes", SERVICES_DIR)
+auth_app = auth["main"].app
+notes_app = notes["main"].app
+
+SessionLocal = auth["app.models.db"].SessionLocal
+validate_access_token = auth["app.services.auth"].validate_access_token
+notes_settings = notes["app.config"].settings
+
+
+def _validate(token: str) -> Optional[UserResponse]:
+    with SessionLocal() as db:
+        return validate_access_token(db, token)
+
+
+async def validate(token: str) -> Optional[UserResponse]:
+    # The user lookup may hit the database, which is synchronous in auth
+    return await run_in_threadpool(_validate, token)
+
+
+# The notes router looks its client up on every request and in its
+# lifespan, so replacing it reroutes validation without touching notes code
+notes["app.routers.notes"].auth_client = InProcessAuthClient(
+    validate,
+    cache_ttl=notes_settings.auth_cache_ttl_seconds,
+    cache_max_entries=notes_settings.auth_cache_max_entries,
+)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Run the mounted apps' lifespans, which Starlette does not do for mounts"""
+    app.state.ready = False
+    async with AsyncExitStack() as stack:
+        for service_app in (auth_app, notes_app):
+            await stack.enter_async_context(service_app.router.lifespan_context(service_app))
+        app.state.ready = True
+        yield
+        app.state.ready = False
+
+
+app = FastAPI(title="jarvis", lifespan=lifespan, docs_url=None, redoc_url=None, openapi_url=None)
+app.mount("/auth", auth_app)
+app.mount("/note", notes_app)
+
+@app.get("/healthz", include_in_schema=False)
+def healthz():
+    return liveness_response()
+
+@app.get("/readyz", include_in_schema=False)
+def readyz():
+    checks = {
+        "auth": getattr(auth_app.state, "ready", False),
+        "notes": getattr(notes_app.state, "ready", False),
+    }
+    return readiness_response(getattr(app.state, "ready", False), checks)
@@ -8,6 +8,149 @@ class NotesServiceSettings(BaseServiceSettings):
     auth_service_url: str = Field(
         description="URL of the auth service"
     )
+    auth_client_max_connections: int = Field(
+        default=100,
+        description="Maximum pooled connections to the auth service"
+    )
+    auth_client_max_keepalive_connections: int = Field(
+        default=20,
+        description="Maximum idle keep-alive connections to the auth service"
+    )
+    auth_client_keepalive_expiry: float = Field(
+        default=30.0,
+        description="Seconds an idle auth service connection is kept alive"
+    )
+    auth_client_http2: bool = Field(
+        default=False,
+        description="Use HTTP/2 for auth service calls (requires the h2 package)"
+    )
+    auth_client_timeout: float = Field(
+        default=5.0,
+        description="Per-attempt timeout for auth service calls, further capped by the request deadline"
+    )
+    auth_client_max_retries: int = Field(
+        default=2,
+        description="Retries for idempotent auth service calls after connect errors, timeouts or 502/503/504"
+    )
+    auth_client_retry_backoff: float = Field(
+        default=0.05,
+        description="Base delay in seconds for exponential retry backoff (full jitter)"
+    )
+    auth_client_retry_backoff_max: float = Field(
+        default=1.0,
+        description="Maximum delay in seconds between retries"
+    )
+    auth_client_breaker_failure_threshold: int = Field(
+        default=5,
+        description="Consecutive failed auth service calls that open the circuit breaker"
+    )
+    auth_client_breaker_reset_timeout: float = Field(
+        default=10.0,
+        description="Seconds the circuit stays open before half-open probe calls are allowed"
+    )
+    auth_client_breaker_half_open_max_calls: int = Field(
+        default=1,
+        description="Concurrent probe calls allowed while the circuit is half-open"
+    )
+    auth_client_warmup_connections: int = Field(
+        default=2,
+        description="Keep-alive connections to the auth service to open on startup"
+    )
+    auth_cache_ttl_seconds: float = Field(
+        default=30.0,
+        description="Maximum seconds a validated token is cached (0 disables the cache)"
+    )
+    auth_cache_max_entries: int = Field(
+        default=10000,
+        description="Maximum number of validated tokens kept in the cache"
+    )
+    auth_local_verification: bool = Field(
+        default=False,
+        description="Verify RS/ES-signed access tokens with the auth service's published keys instead of calling /validate"
+    )
+    auth_jwks_refresh_seconds: float = Field(
+        default=300.0,
+        description="Seconds between refetches of the auth service's signing keys"
+    )
+
+    # Pagination settings
+    notes_page_default_limit: int = Field(
+        default=50,
+        description="Page size for GET /notes when a cursor is given without a limit"
+    )
+    notes_page_max_limit: int = Field(
+        default=200,
+        description="Largest page size accepted by GET /notes"
+    )
+    note_summary_snippet_length: int = Field(
+        default=200,
+        description="Characters of content included in summary listings"
+    )
+
+    # Changes feed settings
+    changes_default_limit: int = Field(
+        default=200,
+        description="Changes returned per GET /notes/changes call when no limit is given"
+    )
+    changes_max_limit: int = Field(
+        default=1000,
+        description="Largest limit accepted by GET /notes/changes"
+    )
+    tombstone_retention_days: float = Field(
+        default=30.0,
+        description="Days deleted notes are kept as tombstones; older cursors must resync"
+    )
+    tombstone_compaction_interval_seconds: float = Field(
+        default=3600.0,
+        description="Seconds between tombstone compaction runs (0 disables the background task)"
+    )
+
+    # Content compression at rest
+    content_compression_threshold: int = Field(
+        default=4096,
+        description="Note content of at least this many UTF-8 bytes is stored compressed"
+    )
+    content_compression_codec: str = Field(
+        default="auto",
+        description="zlib, zstd, or auto (zstd when the zstandard package is installed, else zlib)"
+    )
+    content_compression_level: int = Field(
+        default=6,
+        description="Compression level passed to the codec"
+    )
+
+    bulk_max_operations: int = Field(
+        default=500,
+        description="Largest number of operations accepted by POST /notes/bulk"
+    )
+
+    # Export/import settings
+    export_batch_size: int = Field(
+        default=500,
+        description="Rows fetched per round trip while streaming GET /notes/export"
+    )
+    import_batch_size: int = Field(
+        default=500,
+        description="Notes inserted and committed per transaction by POST /notes/import"
+    )
+    import_max_line_bytes: int = Field(
+        default=8_388_608,
+        description="Longest NDJSON line (one note) accepted by POST /notes/import"
+    )
+    import_max_errors: int = Field(
+        default=100,
+        description="Invalid lines reported individually in an import result"
+    )
+
+    # Search settings
+    search_text_config: str = Field(
+        default="english",
+        description="Postgres text search configuration used for note search"
+    )
+    search_max_limit: int = Field(
+        default=100,
+        description="Largest page size accepted by GET /notes/search"
+    )
 
     app_name: str = Field(
         default="jarvis-notes",
@@ -1,13 +1,21 @@
-from shared.database import create_database_engine, create_session_local, get_database_dependency, Base
+from shared.database import (
+    create_async_database_engine,
+    create_async_session_local,
+    get_async_database_dependency,
+    Base,
+)
 from ..config import settings
+from .notes import add_missing_note_columns
 
-# Create engine and session
-engine = create_database_engine(settings.database_url)
-SessionLocal = create_session_local(engine)
+# Create async engine and session
+engine = create_async_database_engine(settings.database_url, **settings.database_engine_options)
+AsyncSessionLocal = create_async_session_local(engine)
 
 # Create database dependency
-get_db = get_database_dependency(SessionLocal)
+get_db = get_async_database_dependency(AsyncSessionLocal)
 
-def create_tables():
+async def create_tables():
     """Create all tables for the notes service"""
-    Base.metadata.create_all(bind=engine)
\ No newline at end of file
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(add_missing_note_columns)
@@ -1,13 +1,113 @@
 from shared.database import Base
-from sqlalchemy import Column, Integer, String, DateTime
+from shared.text_codec import CompressedText, resolve_codec
+from sqlalchemy import Column, Integer, String, DateTime, Index, DDL, event, inspect, text
 from datetime import datetime, timezone
+from ..config import settings
+
+
+def utcnow() -> datetime:
+    """The current UTC time as a naive datetime, as the DateTime columns store it
+
+    asyncpg refuses timezone-aware values for TIMESTAMP WITHOUT TIME ZONE.
+    """
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
 
 class Note(Base):
     __tablename__ = "notes"
+    __table_args__ = (
+        # Serves per-user listing in (updated_at DESC, id DESC) keyset order
+        Index("ix_notes_user_id_updated_at_id", "user_id", "updated_at", "id"),
+        # Serves the per-user changes feed in change_seq order
+        Index("ix_notes_user_id_change_seq", "user_id", "change_seq"),
+        # Stays empty once every note is numbered, so the startup check is free
+        Index(
+            "ix_notes_change_seq_missing", "change_seq",
+            postgresql_where=text("change_seq IS NULL"),
+            sqlite_where=text("change_seq IS NULL"),
+        ),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, nullable=False)
     title = Column(String, nullable=False)
-    content = Column(String, nullable=False)
-    created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
-    updated_at = Column(DateTime, default=lambda: datetime.now(timezone.utc), onupdate=lambda: datetime.now(timezone.utc))
\ No newline at end of file
+    # Large bodies are stored compressed and decompressed transparently on load
+    content = Column(
+        CompressedText(
+            threshold=settings.content_compression_threshold,
+            codec=resolve_codec(settings.content_compression_codec),
+            level=settings.content_compression_level,
+        ),
+        nullable=False,
+    )
+    created_at = Column(DateTime, default=utcnow)
+    updated_at = Column(DateTime, default=utcnow, onupdate=utcnow)
+    # Bumped on every content/title change; PATCH edits must name the current one
+    version = Column(Integer, nullable=False, default=1, server_default="1")
+    # Per-user sequence number of the last change (see services/changes.py);
+    # rows from before the changes feed are numbered on startup
+    change_seq = Column(Integer, nullable=True)
+    # Set when the note is deleted; the row stays as a tombstone until compacted
+    deleted_at = Column(DateTime, nullable=True)
+
+
+class NoteChangeCounter(Base):
+    """Per-user change sequence allocator for the notes changes feed"""
+    __tablename__ = "note_change_counters"
+
+    user_id = Column(Integer, primary_key=True, autoincrement=False)
+    last_seq = Column(Integer, nullable=False, default=0)
+    # Tombstones with change_seq <= this have been compacted away
+    compacted_seq = Column(Integer, nullable=False, default=0)
+
+
+def add_missing_note_columns(connection) -> None:
+    """Add columns/indexes introduced after a notes table was first created
+
+    create_all only creates missing tables, so databases from before the
+    changes feed are upgraded here. Where migrations own the schema
+    (db_create_tables=false) they must add these instead.
+    """
+    existing = {column["name"] for column in inspect(connection).get_columns(Note.__tablename__)}
+    for column in (Note.__table__.c.version, Note.__table__.c.change_seq, Note.__table__.c.deleted_at):
+        if column.name not in existing:
+            ddl = f"ALTER TABLE {Note.__tablename__} ADD COLUMN {column.name} {column.type.compile(dialect=connection.dialect)}"
+            if column.server_default is not None:
+                ddl += f" NOT NULL DEFAULT {column.server_default.arg}"
+            connection.execute(text(ddl))
+    for index in Note.__table__.indexes:
+        index.create(connection, checkfirst=True)
+
+
+# Full-text search structures, kept in sync by services/search.py.
+# Postgres: an unmapped tsvector column with a GIN index.
+# SQLite: an FTS5 table whose rowid is the note id.
+# Both are idempotent so they also apply to databases created earlier.
+event.listen(
+    Base.metadata,
+    "after_create",
+    DDL("ALTER TABLE notes ADD COLUMN IF NOT EXISTS search_vector tsvector").execute_if(dialect="postgresql"),
+)
+event.listen(
+    Base.metadata,
+    "after_create",
+    DDL(
+        "CREATE INDEX IF NOT EXISTS ix_notes_search_vector ON notes USING GIN (search_vector)"
+    ).execute_if(dialect="postgresql"),
+)
+event.listen(
+    Base.metadata,
+    "after_create",
+    # Live notes not yet indexed, for the startup backfill check
+    DDL(
+        "CREATE INDEX IF NOT EXISTS ix_notes_search_pending ON notes (id) "
+        "WHERE search_vector IS NULL AND deleted_at IS NULL"
+    ).execute_if(dialect="postgresql"),
+)
+event.listen(
+    Base.metadata,
+    "after_create",
+    DDL(
+        "CREATE VIRTUAL TABLE IF NOT EXISTS notes_fts USING fts5(user_id UNINDEXED, title, content)"
+    ).execute_if(dialect="sqlite"),
+)
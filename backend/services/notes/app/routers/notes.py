@@ -1,84 +1,361 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Request
-from sqlalchemy.orm import Session
-from typing import List
-from ..models.db import get_db
-from ..schemas.notes import NoteCreate, NoteUpdate, NoteResponse
+from fastapi import APIRouter, Depends, HTTPException, status, Request, Response, Query, Header
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Literal, Optional, Union
+from ..models.db import AsyncSessionLocal, get_db
+from ..schemas.notes import (
+    NoteCreate,
+    NoteUpdate,
+    NotePatch,
+    NoteVersion,
+    NoteResponse,
+    NoteSummary,
+    NoteSearchResult,
+    NoteChanges,
+    BulkRequest,
+    BulkResponse,
+    ImportResult,
+    note_adapter,
+    note_list_adapter,
+    note_summary_list_adapter,
+)
 from ..services.notes import (
     get_notes_by_user_id,
+    get_notes_page,
+    get_note_summaries,
     get_note_by_id,
+    get_notes_list_etag,
+    note_etag,
     create_note,
     update_note,
-    delete_note
+    patch_note,
+    VersionConflict,
+    delete_note,
+    apply_bulk_operations
 )
+from ..services.changes import CursorExpired, decode_change_cursor, encode_change_cursor, get_changes
+from ..services.search import search_notes
+from ..services.transfer import export_notes, import_notes, iter_lines
 from shared.auth_client import AuthClient
+from shared.etag import etag_matches
+from shared.serialization import model_response
 from shared.schemas.user import UserResponse
 from ..config import settings
 
 # Create auth client instance
-auth_client = AuthClient(settings.auth_service_url)
+auth_client = AuthClient(
+    settings.auth_service_url,
+    cache_ttl=settings.auth_cache_ttl_seconds,
+    cache_max_entries=settings.auth_cache_max_entries,
+    local_verification=settings.auth_local_verification,
+    jwks_refresh_interval=settings.auth_jwks_refresh_seconds,
+    max_connections=settings.auth_client_max_connections,
+    max_keepalive_connections=settings.auth_client_max_keepalive_connections,
+    keepalive_expiry=settings.auth_client_keepalive_expiry,
+    http2=settings.auth_client_http2,
+    timeout=settings.auth_client_timeout,
+    max_retries=settings.auth_client_max_retries,
+    retry_backoff=settings.auth_client_retry_backoff,
+    retry_backoff_max=settings.auth_client_retry_backoff_max,
+    breaker_failure_threshold=settings.auth_client_breaker_failure_threshold,
+    breaker_reset_timeout=settings.auth_client_breaker_reset_timeout,
+    breaker_half_open_max_calls=settings.auth_client_breaker_half_open_max_calls,
+)
 
 async def get_current_user(request: Request) -> UserResponse:
     """Get current user by validating Bearer token with auth service"""
     return await auth_client.get_current_user_from_bearer_token(request)
 
+async def require_if_match(db: AsyncSession, note_id: int, user_id: int, if_match: Optional[str]) -> Optional[int]:
+    """Enforce an If-Match precondition, raising 404 or 412 when it fails
+
+    Returns the version the precondition was checked against, which the
+    write must still find (None without If-Match).
+    """
+    if if_match is None:
+        return None
+
+    note = await get_note_by_id(db, note_id, user_id, for_update=True)
+    if not note:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Note not found"
+        )
+    if not etag_matches(if_match, note_etag(note), weak=False):
+        raise HTTPException(
+            status_code=status.HTTP_412_PRECONDITION_FAILED,
+            detail="Note has been modified"
+        )
+    return note.version
+
 router = APIRouter(
     prefix="/notes",
     tags=["notes"]
 )
 
-@router.get("", response_model=List[NoteResponse])
+@router.get("", response_model=Union[List[NoteResponse], List[NoteSummary]])
 async def list_notes(
-    db: Session = Depends(get_db),
+    request: Request,
+    response: Response,
+    limit: Optional[int] = Query(default=None, ge=1, le=settings.notes_page_max_limit),
+    cursor: Optional[str] = None,
+    fields: Literal["full", "summary"] = "full",
+    if_none_match: Optional[str] = Header(default=None),
+    db: AsyncSession = Depends(get_db),
     current_user: UserResponse = Depends(get_current_user)
 ):
-    notes = get_notes_by_user_id(db, current_user.id)
+    """List notes, newest first; pass limit/cursor for keyset pagination
+
+    When more notes remain, the cursor for the next page is returned in the
+    X-Next-Cursor response header. fields=summary returns NoteSummary items
+    with a short content snippet instead of the full body.
+    """
+    # On a conditional hit the aggregate query is the only work done
+    etag = await get_notes_list_etag(db, current_user.id, request.url.query)
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+    response.headers["ETag"] = etag
+
+    if cursor is not None and limit is None:
+        limit = settings.notes_page_default_limit
+
+    try:
+        if fields == "summary":
+            notes, next_cursor = await get_note_summaries(
+                db, current_user.id, settings.note_summary_snippet_length, limit, cursor
+            )
+        elif limit is None:
+            notes, next_cursor = await get_notes_by_user_id(db, current_user.id), None
+        else:
+            notes, next_cursor = await get_notes_page(db, current_user.id, limit, cursor)
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
+
+    if next_cursor is not None:
+        response.headers["X-Next-Cursor"] = next_cursor
+    if settings.fast_serialization:
+        adapter = note_summary_list_adapter if fields == "summary" else note_list_adapter
+        return model_response(adapter, notes, response)
     return notes
 
+@router.get("/search", response_model=List[NoteSearchResult])
+async def search(
+    q: str = Query(min_length=1),
+    limit: int = Query(default=20, ge=1, le=settings.search_max_limit),
+    offset: int = Query(default=0, ge=0),
+    highlight: bool = False,
+    db: AsyncSession = Depends(get_db),
+    current_user: UserResponse = Depends(get_current_user)
+):
+    """Full-text search over the current user's note titles and content"""
+    return await search_notes(db, current_user.id, q, limit, offset, highlight)
+
+@router.get("/changes", response_model=NoteChanges)
+async def list_changes(
+    since: Optional[str] = None,
+    limit: Optional[int] = Query(default=None, ge=1, le=settings.changes_max_limit),
+    db: AsyncSession = Depends(get_db),
+    current_user: UserResponse = Depends(get_current_user)
+):
+    """Incremental sync: notes changed and deleted since a cursor
+
+    Without since, returns every live note and a cursor to poll from.
+    Returns 410 when since is older than the tombstone retention window;
+    the client must then drop its copy and sync again without since.
+    """
+    try:
+        since_cursor = decode_change_cursor(since) if since is not None else None
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
+
+    try:
+        notes, deleted, cursor, has_more = await get_changes(
+            db, current_user.id, since_cursor, limit or settings.changes_default_limit
+        )
+    except CursorExpired:
+        raise HTTPException(
+            status_code=status.HTTP_410_GONE,
+            detail="Cursor expired, full resync required"
+        )
+
+    return NoteChanges(
+        notes=notes,
+        deleted=deleted,
+        cursor=encode_change_cursor(cursor),
+        has_more=has_more,
+    )
+
+@router.get("/export")
+async def export_user_notes(current_user: UserResponse = Depends(get_current_user)):
+    """Stream every live note as NDJSON (one NoteExport per line), oldest first"""
+    return StreamingResponse(
+        export_notes(AsyncSessionLocal, current_user.id, settings.export_batch_size),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": 'attachment; filename="notes.ndjson"'},
+    )
+
+@router.post("/import", response_model=ImportResult)
+async def import_user_notes(
+    request: Request,
+    db: AsyncSession = Depends(get_db),
+    current_user: UserResponse = Depends(get_current_user)
+):
+    """Create notes from an NDJSON body, e.g. the output of GET /notes/export
+
+    The body is read incrementally and committed in batches; the result
+    counts imported and rejected lines.
+    """
+    lines = iter_lines(request.stream(), settings.import_max_line_bytes)
+    return await import_notes(
+        db, current_user.id, lines, settings.import_batch_size, settings.import_max_errors
+    )
+
 @router.get("/{note_id}", response_model=NoteResponse)
 async def get_note(
     note_id: int,
-    db: Session = Depends(get_db),
+    response: Response,
+    if_none_match: Optional[str] = Header(default=None),
+    db: AsyncSession = Depends(get_db),
     current_user: UserResponse = Depends(get_current_user)
 ):
-    note = get_note_by_id(db, note_id, current_user.id)
+    note = await get_note_by_id(db, note_id, current_user.id)
     if not note:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Note not found"
         )
+
+    etag = note_etag(note)
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+    response.headers["ETag"] = etag
+    if settings.fast_serialization:
+        return model_response(note_adapter, note, response)
     return note
 
 @router.post("", response_model=NoteResponse)
 async def create_new_note(
     note_data: NoteCreate,
-    db: Session = Depends(get_db),
+    response: Response,
+    db: AsyncSession = Depends(get_db),
     current_user: UserResponse = Depends(get_current_user)
 ):
-    new_note = create_note(db, note_data, current_user.id)
+    new_note = await create_note(db, note_data, current_user.id)
+    response.headers["ETag"] = note_etag(new_note)
     return new_note
 
+@router.post("/bulk", response_model=BulkResponse)
+async def bulk_notes(
+    bulk_request: BulkRequest,
+    response: Response,
+    db: AsyncSession = Depends(get_db),
+    current_user: UserResponse = Depends(get_current_user)
+):
+    """Apply many creates/updates/deletes in one transaction
+
+    Returns 409 when an atomic batch is rejected; per-item errors say why.
+    """
+    if len(bulk_request.operations) > settings.bulk_max_operations:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"At most {settings.bulk_max_operations} operations per batch"
+        )
+
+    results = await apply_bulk_operations(
+        db, bulk_request.operations, current_user.id, atomic=bulk_request.mode == "atomic"
+    )
+    applied = sum(1 for result in results if result["ok"])
+    if bulk_request.mode == "atomic" and applied < len(results):
+        response.status_code = status.HTTP_409_CONFLICT
+
+    return BulkResponse(
+        mode=bulk_request.mode,
+        applied=applied,
+        failed=len(results) - applied,
+        results=results,
+    )
+
 @router.put("/{note_id}", response_model=NoteResponse)
 async def update_existing_note(
     note_id: int,
     note_data: NoteUpdate,
-    db: Session = Depends(get_db),
+    response: Response,
+    if_match: Optional[str] = Header(default=None),
+    db: AsyncSession = Depends(get_db),
     current_user: UserResponse = Depends(get_current_user)
 ):
-    updated_note = update_note(db, note_id, note_data, current_user.id)
+    expected_version = await require_if_match(db, note_id, current_user.id, if_match)
+    try:
+        updated_note = await update_note(db, note_id, note_data, current_user.id, expected_version)
+    except VersionConflict:
+        raise HTTPException(
+            status_code=status.HTTP_412_PRECONDITION_FAILED,
+            detail="Note has been modified"
+        )
     if not updated_note:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Note not found"
         )
+    response.headers["ETag"] = note_etag(updated_note)
     return updated_note
 
+@router.patch("/{note_id}", response_model=NoteVersion)
+async def patch_existing_note(
+    note_id: int,
+    patch: NotePatch,
+    response: Response,
+    db: AsyncSession = Depends(get_db),
+    current_user: UserResponse = Depends(get_current_user)
+):
+    """Apply text edits to a note without re-sending its content
+
+    The edits only apply if the note is still at patch.version; otherwise
+    409 is returned and the client should re-read the note and rebase.
+    """
+    try:
+        result = await patch_note(db, note_id, patch, current_user.id)
+    except VersionConflict as conflict:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Version conflict: note is at version {conflict.current_version}"
+        )
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="Edit out of range"
+        )
+    if result is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Note not found"
+        )
+
+    version = NoteVersion(**result)
+    response.headers["ETag"] = note_etag(version)
+    return version
+
 @router.delete("/{note_id}")
 async def delete_existing_note(
     note_id: int,
-    db: Session = Depends(get_db),
+    if_match: Optional[str] = Header(default=None),
+    db: AsyncSession = Depends(get_db),
     current_user: UserResponse = Depends(get_current_user)
 ):
-    success = delete_note(db, note_id, current_user.id)
+    expected_version = await require_if_match(db, note_id, current_user.id, if_match)
+    try:
+        success = await delete_note(db, note_id, current_user.id, expected_version)
+    except VersionConflict:
+        raise HTTPException(
+            status_code=status.HTTP_412_PRECONDITION_FAILED,
+            detail="Note has been modified"
+        )
     if not success:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
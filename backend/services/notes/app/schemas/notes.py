@@ -1,6 +1,6 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field, TypeAdapter
 from datetime import datetime
-from typing import Optional
+from typing import Annotated, List, Literal, Optional, Union
 
 class NoteCreate(BaseModel):
     title: str
@@ -11,13 +11,152 @@ class NoteUpdate(BaseModel):
     title: Optional[str] = None
     content: Optional[str] = None
 
+class TextEdit(BaseModel):
+    """Replace ``delete`` characters at ``offset`` with ``insert``
+
+    Offsets count Unicode code points and apply to the text as left by the
+    previous edit in the same request.
+    """
+    offset: int = Field(ge=0)
+    delete: int = Field(default=0, ge=0)
+    insert: str = ""
+
+class NotePatch(BaseModel):
+    """Partial update applied only if the note is still at ``version``"""
+    version: int
+    edits: List[TextEdit] = []
+    title: Optional[str] = None
+
 class NoteResponse(BaseModel):
     id: int
     user_id: int
     title: str
     content: str
+    version: int
+    created_at: datetime
+    updated_at: datetime
+
+    class Config:
+        from_attributes = True
+
+class NoteVersion(BaseModel):
+    """Result of a PATCH: the new version, without echoing the content back"""
+    id: int
+    version: int
+    content_length: int
+    updated_at: datetime
+
+class NoteSummary(BaseModel):
+    """Note listing entry without the full content"""
+    id: int
+    title: str
+    snippet: str
     created_at: datetime
     updated_at: datetime
 
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+class NoteSearchResult(BaseModel):
+    """Ranked search hit; snippet is only set when highlighting is requested"""
+    id: int
+    title: str
+    created_at: datetime
+    updated_at: datetime
+    rank: float
+    snippet: Optional[str] = None
+
+    class Config:
+        from_attributes = True
+
+class BulkCreateOperation(BaseModel):
+    op: Literal["create"]
+    title: str
+    content: str
+
+class BulkUpdateOperation(BaseModel):
+    op: Literal["update"]
+    id: int
+    title: Optional[str] = None
+    content: Optional[str] = None
+
+class BulkDeleteOperation(BaseModel):
+    op: Literal["delete"]
+    id: int
+
+BulkOperation = Annotated[
+    Union[BulkCreateOperation, BulkUpdateOperation, BulkDeleteOperation],
+    Field(discriminator="op"),
+]
+
+class BulkRequest(BaseModel):
+    """Mixed batch of note operations applied in a single transaction
+
+    atomic: nothing is written if any operation fails.
+    best_effort: failing operations are reported and the rest are applied.
+    """
+    mode: Literal["atomic", "best_effort"] = "atomic"
+    operations: List[BulkOperation]
+
+class BulkItemResult(BaseModel):
+    index: int
+    op: str
+    id: Optional[int] = None
+    ok: bool
+    error: Optional[str] = None
+
+class BulkResponse(BaseModel):
+    mode: str
+    applied: int
+    failed: int
+    results: List[BulkItemResult]
+
+
+class NoteChanges(BaseModel):
+    """Notes created or updated, and ids deleted, after the requested cursor
+
+    Pass cursor as ``since`` on the next poll; when has_more is set, poll
+    again straight away for the rest.
+    """
+    notes: List[NoteResponse]
+    deleted: List[int]
+    cursor: str
+    has_more: bool
+
+class NoteExport(BaseModel):
+    """One line of a notes export (NDJSON)"""
+    id: int
+    title: str
+    content: str
+    version: int
+    created_at: datetime
+    updated_at: datetime
+
+    class Config:
+        from_attributes = True
+
+class NoteImport(BaseModel):
+    """One line of a notes import; id and version from an export are ignored"""
+    title: str
+    content: str
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+
+class ImportLineError(BaseModel):
+    line: int
+    error: str
+
+class ImportResult(BaseModel):
+    """Counts for an import; batches committed before a failure stay imported"""
+    imported: int
+    failed: int
+    batches: int
+    errors: List[ImportLineError]
+
+
+# Prebuilt serializers for the fast response path (see shared.serialization)
+note_adapter = TypeAdapter(NoteResponse)
+note_list_adapter = TypeAdapter(List[NoteResponse])
+note_summary_list_adapter = TypeAdapter(List[NoteSummary])
+note_export_adapter = TypeAdapter(NoteExport)
+note_import_adapter = TypeAdapter(NoteImport)
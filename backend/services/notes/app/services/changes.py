@@ -0,0 +1,203 @@
+import asyncio
+import base64
+import logging
+from datetime import timedelta
+from typing import List, NamedTuple, Optional, Tuple
+
+from sqlalchemy import bindparam, delete, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..models.notes import Note, NoteChangeCounter, utcnow
+
+logger = logging.getLogger(__name__)
+
+
+class CursorExpired(Exception):
+    """The cursor predates compacted tombstones; the client must resync in full"""
+
+
+class ChangeCursor(NamedTuple):
+    """Position in a user's changes feed
+
+    ``after_id`` is set while paging a full snapshot: the snapshot was taken
+    at ``seq`` and continues after that note id.
+    """
+    seq: int
+    after_id: Optional[int] = None
+
+
+def encode_change_cursor(cursor: ChangeCursor) -> str:
+    """Encode a ChangeCursor as an opaque string"""
+    if cursor.after_id is None:
+        raw = f"c{cursor.seq}"
+    else:
+        raw = f"s{cursor.seq}.{cursor.after_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_change_cursor(cursor: str) -> ChangeCursor:
+    """Decode a cursor from encode_change_cursor, raising ValueError if malformed"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        if raw.startswith("c"):
+            decoded = ChangeCursor(int(raw[1:]))
+        elif raw.startswith("s"):
+            seq, after_id = raw[1:].split(".")
+            decoded = ChangeCursor(int(seq), int(after_id))
+        else:
+            raise ValueError
+    except (TypeError, ValueError, UnicodeDecodeError) as e:
+        raise ValueError("Invalid cursor") from e
+    if decoded.seq < 0 or (decoded.after_id is not None and decoded.after_id < 0):
+        raise ValueError("Invalid cursor")
+    return decoded
+
+
+async def allocate_change_seqs(db: AsyncSession, user_id: int, count: int = 1) -> int:
+    """Reserve ``count`` consecutive change numbers for a user and return the last
+
+    The upsert locks the user's counter row until the caller commits, so a
+    user's changes commit in sequence order and readers never skip one.
+    """
+    insert = postgresql.insert if db.get_bind().dialect.name == "postgresql" else sqlite.insert
+    statement = (
+        insert(NoteChangeCounter)
+        .values(user_id=user_id, last_seq=count, compacted_seq=0)
+        .on_conflict_do_update(
+            index_elements=[NoteChangeCounter.user_id],
+            set_={"last_seq": NoteChangeCounter.last_seq + count},
+        )
+        .returning(NoteChangeCounter.last_seq)
+    )
+    return (await db.execute(statement)).scalar_one()
+
+
+async def get_changes(
+    db: AsyncSession, user_id: int, since: Optional[ChangeCursor], limit: int
+) -> Tuple[List[Note], List[int], ChangeCursor, bool]:
+    """Notes changed and ids deleted after ``since``, in change order
+
+    Returns (notes, deleted_ids, cursor, has_more). Without ``since``, or
+    with a snapshot cursor, this pages a full snapshot of live notes in id
+    order and no tombstones; once it is complete the cursor resumes the
+    feed from where the snapshot started. Raises CursorExpired when
+    tombstones newer than ``since`` were compacted.
+    """
+    counter = (await db.execute(
+        select(NoteChangeCounter.last_seq, NoteChangeCounter.compacted_seq)
+        .where(NoteChangeCounter.user_id == user_id)
+    )).first()
+    last_seq, compacted_seq = counter if counter is not None else (0, 0)
+
+    if since is None or since.after_id is not None:
+        # Snapshot pages are keyed by id, so compaction cannot expire them
+        snapshot_seq = last_seq if since is None else since.seq
+        query = select(Note).where(Note.user_id == user_id, Note.deleted_at.is_(None))
+        if since is not None:
+            query = query.where(Note.id > since.after_id)
+        rows = list((await db.execute(query.order_by(Note.id).limit(limit + 1))).scalars().all())
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        cursor = ChangeCursor(snapshot_seq, rows[-1].id) if has_more else ChangeCursor(snapshot_seq)
+        return rows, [], cursor, has_more
+
+    if since.seq < compacted_seq:
+        raise CursorExpired()
+    rows = list((await db.execute(
+        select(Note)
+        .where(Note.user_id == user_id, Note.change_seq > since.seq)
+        .order_by(Note.change_seq)
+        .limit(limit + 1)
+    )).scalars().all())
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    if has_more:
+        cursor = ChangeCursor(rows[-1].change_seq)
+    else:
+        # Caught up: later polls only need changes after the newest one
+        cursor = ChangeCursor(max(since.seq, last_seq))
+
+    notes = [note for note in rows if note.deleted_at is None]
+    deleted_ids = [note.id for note in rows if note.deleted_at is not None]
+    return notes, deleted_ids, cursor, has_more
+
+
+async def change_seq_backfill_pending(db: AsyncSession) -> bool:
+    """Cheaply check (via ix_notes_change_seq_missing) whether any note lacks a change_seq"""
+    result = await db.execute(select(Note.id).where(Note.change_seq.is_(None)).limit(1))
+    return result.first() is not None
+
+
+async def backfill_change_seqs(db: AsyncSession, batch_size: int = 500) -> int:
+    """Number notes written before the changes feed existed; returns how many"""
+    statement = (
+        update(Note.__table__)
+        .where(Note.__table__.c.id == bindparam("note_id"))
+        .values(change_seq=bindparam("seq"), updated_at=Note.__table__.c.updated_at)
+    )
+    numbered = 0
+    while True:
+        rows = (await db.execute(
+            select(Note.id, Note.user_id)
+            .where(Note.change_seq.is_(None))
+            .order_by(Note.user_id, Note.id)
+            .limit(batch_size)
+        )).all()
+        if not rows:
+            return numbered
+
+        by_user = {}
+        for row in rows:
+            by_user.setdefault(row.user_id, []).append(row.id)
+        for user_id, note_ids in by_user.items():
+            next_seq = await allocate_change_seqs(db, user_id, len(note_ids)) - len(note_ids) + 1
+            await db.execute(statement, [
+                {"note_id": note_id, "seq": next_seq + offset} for offset, note_id in enumerate(note_ids)
+            ])
+        await db.commit()
+        numbered += len(rows)
+
+
+async def compact_tombstones(db: AsyncSession, retention: timedelta, batch_size: int = 1000) -> int:
+    """Hard-delete tombstones older than ``retention``; returns how many were removed
+
+    Each user's compacted_seq is raised to the newest removed tombstone so
+    cursors older than that get CursorExpired instead of missing deletes.
+    """
+    cutoff = utcnow() - retention
+    removed = 0
+    while True:
+        rows = (await db.execute(
+            select(Note.id, Note.user_id, Note.change_seq)
+            .where(Note.deleted_at.is_not(None), Note.deleted_at < cutoff)
+            .limit(batch_size)
+        )).all()
+        if not rows:
+            break
+
+        horizons = {}
+        for row in rows:
+            horizons[row.user_id] = max(horizons.get(row.user_id, 0), row.change_seq or 0)
+        for user_id, seq in horizons.items():
+            await db.execute(
+                NoteChangeCounter.__table__.update()
+                .where(NoteChangeCounter.user_id == user_id, NoteChangeCounter.compacted_seq < seq)
+                .values(compacted_seq=seq)
+            )
+        await db.execute(delete(Note).where(Note.id.in_([row.id for row in rows])))
+        await db.commit()
+        removed += len(rows)
+    return removed
+
+
+async def compact_tombstones_periodically(session_factory, interval: float, retention: timedelta) -> None:
+    """Run compact_tombstones every ``interval`` seconds until cancelled"""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            async with session_factory() as db:
+                await compact_tombstones(db, retention)
+        except Exception:
+            logger.exception("Tombstone compaction failed")
@@ -0,0 +1,71 @@
+import asyncio
+from typing import Optional
+
+from sqlalchemy import String, bindparam, func, select, type_coerce, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from shared.text_codec import MARKER
+from ..models.notes import Note
+
+
+async def compress_existing_notes(
+    db: AsyncSession,
+    batch_size: int = 500,
+    pause_seconds: float = 0.0,
+    max_batches: Optional[int] = None,
+) -> int:
+    """Rewrite plain-text note content that is over the compression threshold
+
+    Walks the table in id order, one committed batch at a time, so it can
+    run alongside live traffic and be resumed. Each rewrite only applies if
+    the note is still at the version it was read at; a note edited in
+    between was already compressed by that write and is skipped. updated_at
+    is left as is, so ordering, cursors and ETags do not change. Returns the
+    rows rewritten.
+    """
+    content_type = Note.content.type
+    stored = type_coerce(Note.content, String)
+    # SQL length() counts characters; a note needs at least threshold/4
+    # characters to reach threshold UTF-8 bytes, and Python decides exactly
+    min_length = max(1, content_type.threshold // 4)
+
+    statement = (
+        update(Note.__table__)
+        .where(Note.__table__.c.id == bindparam("note_id"), Note.__table__.c.version == bindparam("seen_version"))
+        .values(content=bindparam("new_content"), updated_at=Note.__table__.c.updated_at)
+    )
+
+    rewritten = 0
+    last_id = 0
+    batches = 0
+    while max_batches is None or batches < max_batches:
+        result = await db.execute(
+            select(Note.id, Note.version, stored.label("stored"))
+            .where(
+                Note.id > last_id,
+                func.length(stored) >= min_length,
+                func.substr(stored, 1, 1) != MARKER,
+            )
+            .order_by(Note.id)
+            .limit(batch_size)
+        )
+        rows = result.all()
+        if not rows:
+            break
+        last_id = rows[-1].id
+        batches += 1
+
+        # Plain rows are their own content; the column type compresses on write
+        changed = [
+            {"note_id": row.id, "seen_version": row.version, "new_content": row.stored}
+            for row in rows
+            if content_type.process_bind_param(row.stored, None) != row.stored
+        ]
+        if changed:
+            updated = await db.execute(statement, changed)
+            rewritten += updated.rowcount if updated.supports_sane_multi_rowcount() else len(changed)
+        await db.commit()
+
+        if pause_seconds:
+            await asyncio.sleep(pause_seconds)
+    return rewritten
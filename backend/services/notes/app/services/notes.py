@@ -1,54 +1,438 @@
-from typing import List, Optional
-from sqlalchemy.orm import Session
-from ..models.notes import Note
-from ..schemas.notes import NoteCreate, NoteUpdate
+import base64
+import json
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+from sqlalchemy import Row, and_, bindparam, case, func, insert, or_, select, type_coerce, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from shared.etag import make_etag
+from shared.text_codec import MARKER, CompressedTextPrefix, stored_prefix_length
+from ..models.notes import Note, utcnow
+from ..schemas.notes import NoteCreate, NoteUpdate, NotePatch, TextEdit, BulkOperation
+from .changes import allocate_change_seqs
+from .search import index_note, index_notes, unindex_note, unindex_notes
 
 
-def get_notes_by_user_id(db: Session, user_id: int) -> List[Note]:
-    """Get all notes for a specific user"""
-    return db.query(Note).filter(Note.user_id == user_id).all()
+class VersionConflict(Exception):
+    """A write expected a version other than the note's current one"""
 
+    def __init__(self, current_version: int):
+        super().__init__(f"Note is at version {current_version}")
+        self.current_version = current_version
 
-def get_note_by_id(db: Session, note_id: int, user_id: int) -> Optional[Note]:
-    """Get a specific note by ID for a user"""
-    return db.query(Note).filter(Note.id == note_id, Note.user_id == user_id).first()
 
+def encode_cursor(note: Note) -> str:
+    """Encode a note's (updated_at, id) sort key as an opaque cursor"""
+    raw = json.dumps([note.updated_at.isoformat(), note.id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
 
-def create_note(db: Session, note_data: NoteCreate, user_id: int) -> Note:
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """Decode a cursor from encode_cursor, raising ValueError if malformed"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        updated_at, note_id = json.loads(raw)
+        return datetime.fromisoformat(updated_at), int(note_id)
+    except (TypeError, ValueError) as e:
+        raise ValueError("Invalid cursor") from e
+
+
+def _user_notes_query(user_id: int, *columns):
+    query = select(*columns) if columns else select(Note)
+    return (
+        query
+        .where(Note.user_id == user_id, Note.deleted_at.is_(None))
+        .order_by(Note.updated_at.desc(), Note.id.desc())
+    )
+
+
+def _summary_columns(snippet_length: int):
+    """Columns for a note summary
+
+    Only a prefix of the content leaves the database: the snippet itself for
+    plain rows, and for compressed rows a bounded prefix of the payload
+    that is decompressed just far enough for the snippet.
+    """
+    stored_length = stored_prefix_length(snippet_length)
+    snippet = case(
+        (func.substr(Note.content, 1, 1) == MARKER, func.substr(Note.content, 1, stored_length)),
+        else_=func.substr(Note.content, 1, snippet_length),
+    )
+    return (
+        Note.id,
+        Note.title,
+        Note.created_at,
+        Note.updated_at,
+        type_coerce(snippet, CompressedTextPrefix(snippet_length, stored_length)).label("snippet"),
+    )
+
+
+async def _fill_missing_snippets(db: AsyncSession, rows: List[Row], snippet_length: int) -> List[Any]:
+    """Decode from the full content the snippets a bounded prefix was too short for
+
+    Only zstd rows written before compress_text ended its first block early
+    need this; see shared.text_codec.PREFIX_BLOCK_BYTES.
+    """
+    missing = [row.id for row in rows if row.snippet is None]
+    if not missing:
+        return rows
+    result = await db.execute(
+        select(Note.id, type_coerce(Note.content, CompressedTextPrefix(snippet_length)))
+        .where(Note.id.in_(missing))
+    )
+    snippets = dict(result.all())
+    return [
+        row if row.snippet is not None else {**row._mapping, "snippet": snippets.get(row.id, "")}
+        for row in rows
+    ]
+
+
+async def _fetch_page(db: AsyncSession, query, limit: int, cursor: Optional[str], scalars: bool = True):
+    """Run a keyset-ordered query for one page, returning (rows, next_cursor)
+
+    Seeking past the last (updated_at, id) seen, rather than using OFFSET,
+    keeps pages from shifting when notes are inserted concurrently.
+    """
+    if cursor is not None:
+        updated_at, note_id = decode_cursor(cursor)
+        query = query.where(
+            or_(
+                Note.updated_at < updated_at,
+                and_(Note.updated_at == updated_at, Note.id < note_id),
+            )
+        )
+
+    # Fetch one extra row to learn whether another page exists
+    result = await db.execute(query.limit(limit + 1))
+    rows = list(result.scalars().all() if scalars else result.all())
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1])
+    return rows, next_cursor
+
+
+async def get_notes_by_user_id(db: AsyncSession, user_id: int) -> List[Note]:
+    """Get all notes for a specific user, most recently updated first"""
+    result = await db.execute(_user_notes_query(user_id))
+    return list(result.scalars().all())
+
+
+async def get_notes_page(
+    db: AsyncSession, user_id: int, limit: int, cursor: Optional[str] = None
+) -> Tuple[List[Note], Optional[str]]:
+    """Get one keyset page of a user's notes and the cursor for the next page"""
+    return await _fetch_page(db, _user_notes_query(user_id), limit, cursor)
+
+
+async def get_note_summaries(
+    db: AsyncSession,
+    user_id: int,
+    snippet_length: int,
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+) -> Tuple[List[Any], Optional[str]]:
+    """Get id/title/timestamps and a content snippet for a user's notes
+
+    Pages like get_notes_page when a limit is given, otherwise returns all.
+    """
+    query = _user_notes_query(user_id, *_summary_columns(snippet_length))
+    if limit is None:
+        rows, next_cursor = list((await db.execute(query)).all()), None
+    else:
+        rows, next_cursor = await _fetch_page(db, query, limit, cursor, scalars=False)
+    return await _fill_missing_snippets(db, rows, snippet_length), next_cursor
+
+
+async def get_note_by_id(db: AsyncSession, note_id: int, user_id: int, for_update: bool = False) -> Optional[Note]:
+    """Get a specific note by ID for a user, optionally locking the row"""
+    query = select(Note).where(Note.id == note_id, Note.user_id == user_id, Note.deleted_at.is_(None))
+    if for_update:
+        query = query.with_for_update()
+    result = await db.execute(query)
+    return result.scalars().first()
+
+
+def note_etag(note: Note) -> str:
+    """Strong ETag for a single note, derived from its id and updated_at"""
+    return make_etag(note.id, note.updated_at.isoformat())
+
+
+async def get_notes_list_etag(db: AsyncSession, user_id: int, variant: str = "") -> str:
+    """ETag for a user's note list from a cheap count/max(change_seq) aggregate
+
+    Every write gives the note a new, higher change_seq, so the pair only
+    repeats when the list is unchanged; updated_at would not do, since
+    imports keep historical timestamps. variant distinguishes differently
+    shaped listings (query parameters).
+    """
+    result = await db.execute(
+        select(func.count(Note.id), func.max(Note.change_seq))
+        .where(Note.user_id == user_id, Note.deleted_at.is_(None))
+    )
+    count, last_seq = result.one()
+    return make_etag(user_id, count, last_seq or 0, variant)
+
+
+async def create_note(db: AsyncSession, note_data: NoteCreate, user_id: int) -> Note:
     """Create a new note for a user"""
     new_note = Note(
         user_id=user_id,
         title=note_data.title,
-        content=note_data.content
+        content=note_data.content,
+        change_seq=await allocate_change_seqs(db, user_id),
     )
     db.add(new_note)
-    db.commit()
-    db.refresh(new_note)
+    await db.flush()
+    await index_note(db, new_note.id, user_id, new_note.title, new_note.content)
+    await db.commit()
+    await db.refresh(new_note)
     return new_note
 
 
-def update_note(db: Session, note_id: int, note_data: NoteUpdate, user_id: int) -> Optional[Note]:
-    """Update an existing note for a user"""
-    note = db.query(Note).filter(Note.id == note_id, Note.user_id == user_id).first()
+async def update_note(
+    db: AsyncSession, note_id: int, note_data: NoteUpdate, user_id: int, expected_version: Optional[int] = None
+) -> Optional[Note]:
+    """Update an existing note for a user
+
+    With ``expected_version`` the write only applies if the note is still at
+    that version; otherwise VersionConflict is raised.
+    """
+    note = await get_note_by_id(db, note_id, user_id)
     if not note:
         return None
-    
-    if note_data.title is not None:
-        note.title = note_data.title
-    if note_data.content is not None:
-        note.content = note_data.content
-    
-    db.commit()
-    db.refresh(note)
+
+    title = note_data.title if note_data.title is not None else note.title
+    content = note_data.content if note_data.content is not None else note.content
+    statement = update(Note).where(Note.id == note_id)
+    if expected_version is not None:
+        # Conditional, as in patch_note, since SQLite cannot lock the row
+        statement = statement.where(Note.version == expected_version)
+    result = await db.execute(
+        statement
+        .values(
+            title=title,
+            content=content,
+            version=Note.version + 1,
+            change_seq=await allocate_change_seqs(db, user_id),
+        )
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount == 0:
+        await db.rollback()
+        current = await get_note_by_id(db, note_id, user_id)
+        if current is None:
+            return None
+        raise VersionConflict(current.version)
+    await index_note(db, note_id, user_id, title, content)
+
+    await db.commit()
+    await db.refresh(note)
     return note
 
 
-def delete_note(db: Session, note_id: int, user_id: int) -> bool:
-    """Delete a note for a user"""
-    note = db.query(Note).filter(Note.id == note_id, Note.user_id == user_id).first()
+def apply_text_edits(content: str, edits: List[TextEdit]) -> str:
+    """Apply edits in order, raising ValueError if one falls outside the text"""
+    for edit in edits:
+        if edit.offset + edit.delete > len(content):
+            raise ValueError("Edit out of range")
+        content = content[:edit.offset] + edit.insert + content[edit.offset + edit.delete:]
+    return content
+
+
+async def patch_note(db: AsyncSession, note_id: int, patch: NotePatch, user_id: int) -> Optional[Dict[str, Any]]:
+    """Apply text edits to a note at a known version
+
+    Returns the new id/version/updated_at/content_length, or None if the
+    note does not exist. Raises VersionConflict if the note is at another
+    version and ValueError if an edit is out of range.
+    """
+    note = await get_note_by_id(db, note_id, user_id, for_update=True)
     if not note:
-        return False
-    
-    db.delete(note)
-    db.commit()
-    return True
\ No newline at end of file
+        return None
+    if note.version != patch.version:
+        raise VersionConflict(note.version)
+
+    content = apply_text_edits(note.content, patch.edits)
+    title = patch.title if patch.title is not None else note.title
+
+    # Conditional on the version so a concurrent writer cannot be overwritten
+    # even where the row lock above is unavailable (SQLite)
+    result = await db.execute(
+        update(Note)
+        .where(Note.id == note_id, Note.version == patch.version)
+        .values(
+            title=title,
+            content=content,
+            version=Note.version + 1,
+            change_seq=await allocate_change_seqs(db, user_id),
+        )
+        .returning(Note.id, Note.version, Note.updated_at)
+        .execution_options(synchronize_session=False)
+    )
+    row = result.first()
+    if row is None:
+        await db.rollback()
+        current = await get_note_by_id(db, note_id, user_id)
+        if current is None:
+            return None
+        raise VersionConflict(current.version)
+
+    await index_note(db, note_id, user_id, title, content)
+    await db.commit()
+    return {"id": row.id, "version": row.version, "updated_at": row.updated_at, "content_length": len(content)}
+
+
+def _tombstone_values(change_seq: int) -> Dict[str, Any]:
+    """Column values that turn a note into a deletion tombstone for the changes feed"""
+    now = utcnow()
+    return {"title": "", "content": "", "deleted_at": now, "updated_at": now, "change_seq": change_seq}
+
+
+async def delete_note(db: AsyncSession, note_id: int, user_id: int, expected_version: Optional[int] = None) -> bool:
+    """Delete a note for a user, leaving a tombstone until compaction
+
+    With ``expected_version`` the note is only deleted if it is still at
+    that version; otherwise VersionConflict is raised.
+    """
+    statement = update(Note).where(Note.id == note_id, Note.user_id == user_id, Note.deleted_at.is_(None))
+    if expected_version is not None:
+        statement = statement.where(Note.version == expected_version)
+    result = await db.execute(
+        statement
+        .values(**_tombstone_values(await allocate_change_seqs(db, user_id)))
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount == 0:
+        await db.rollback()
+        current = await get_note_by_id(db, note_id, user_id)
+        if current is None:
+            return False
+        raise VersionConflict(current.version)
+
+    await unindex_note(db, note_id)
+    await db.commit()
+    return True
+
+
+async def apply_bulk_operations(
+    db: AsyncSession, operations: List[BulkOperation], user_id: int, atomic: bool = True
+) -> List[Dict[str, Any]]:
+    """Apply a mixed batch of creates, updates and deletes in one transaction
+
+    Ownership of every referenced note is checked with a single SELECT, then
+    each kind of operation is written with one bulk statement. Returns one
+    result dict per operation, in order. In atomic mode nothing is written
+    if any operation fails; otherwise failing operations are skipped. If a
+    note changes between the read and the write, nothing is written.
+    """
+    results: List[Dict[str, Any]] = []
+
+    # Load the notes that updates/deletes refer to, scoped to this user, and
+    # lock them so a concurrent PATCH waits instead of being overwritten
+    referenced_ids = {op.id for op in operations if op.op != "create"}
+    existing: Dict[int, Dict[str, Any]] = {}
+    if referenced_ids:
+        rows = await db.execute(
+            select(Note.id, Note.title, Note.content, Note.version)
+            .where(Note.user_id == user_id, Note.id.in_(referenced_ids), Note.deleted_at.is_(None))
+            .with_for_update()
+        )
+        existing = {
+            row.id: {"title": row.title, "content": row.content, "version": row.version}
+            for row in rows
+        }
+
+    creates: List[Dict[str, Any]] = []
+    create_results: List[Dict[str, Any]] = []
+    # Note id -> the version it was read at
+    updates: Dict[int, int] = {}
+    deletes: List[int] = []
+
+    for index, op in enumerate(operations):
+        result = {"index": index, "op": op.op, "id": getattr(op, "id", None), "ok": True, "error": None}
+        results.append(result)
+
+        if op.op == "create":
+            creates.append({"user_id": user_id, "title": op.title, "content": op.content})
+            create_results.append(result)
+            continue
+
+        if op.id not in existing:
+            result.update(ok=False, error="Note not found")
+            continue
+
+        if op.op == "update":
+            updates.setdefault(op.id, existing[op.id]["version"])
+            for field in ("title", "content"):
+                value = getattr(op, field)
+                if value is not None:
+                    existing[op.id][field] = value
+        else:
+            deletes.append(op.id)
+            # Later operations in the batch can no longer see this note
+            del existing[op.id]
+            updates.pop(op.id, None)
+
+    if atomic and any(not result["ok"] for result in results):
+        for result in results:
+            if result["ok"]:
+                result.update(ok=False, error="Batch aborted")
+        return results
+
+    # One change number per written note: creates, then updates, then deletes
+    written = len(creates) + len(updates) + len(deletes)
+    if written:
+        next_seq = await allocate_change_seqs(db, user_id, written) - written + 1
+        for row in creates:
+            row["change_seq"] = next_seq
+            next_seq += 1
+    update_rows = []
+    for note_id, version in updates.items():
+        update_rows.append({
+            "b_id": note_id,
+            "b_version": version,
+            "b_title": existing[note_id]["title"],
+            "b_content": existing[note_id]["content"],
+            "b_change_seq": next_seq,
+        })
+        next_seq += 1
+
+    if creates:
+        inserted = await db.execute(
+            insert(Note).returning(Note.id, sort_by_parameter_order=True), creates
+        )
+        for result, note_id in zip(create_results, inserted.scalars().all()):
+            result["id"] = note_id
+    if update_rows:
+        # Conditional on the version read above, as in patch_note: the row
+        # lock covers Postgres and the condition covers SQLite, which has none
+        updated = await db.execute(
+            update(Note.__table__)
+            .where(Note.id == bindparam("b_id"), Note.version == bindparam("b_version"))
+            .values(
+                title=bindparam("b_title"),
+                content=bindparam("b_content"),
+                change_seq=bindparam("b_change_seq"),
+                version=Note.version + 1,
+            ),
+            update_rows,
+        )
+        if updated.supports_sane_multi_rowcount() and updated.rowcount != len(update_rows):
+            await db.rollback()
+            for result in results:
+                result.update(ok=False, error="Batch aborted: a note was changed concurrently")
+            return results
+    if deletes:
+        await db.execute(update(Note), [
+            {"id": note_id, **_tombstone_values(next_seq + offset)}
+            for offset, note_id in enumerate(deletes)
+        ])
+
+    await index_notes(db, [
+        *((result["id"], user_id, row["title"], row["content"]) for result, row in zip(create_results, creates)),
+        *((note_id, user_id, existing[note_id]["title"], existing[note_id]["content"]) for note_id in updates),
+    ])
+    await unindex_notes(db, deletes)
+    await db.commit()
+    return results
@@ -0,0 +1,182 @@
+import re
+from typing import Any, Dict, Iterable, List, Tuple, Union
+
+from sqlalchemy import Row, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from shared.text_codec import MARKER, decompress_text
+
+from ..config import settings
+from ..models.notes import Note
+
+HIGHLIGHT_START = "<mark>"
+HIGHLIGHT_STOP = "</mark>"
+HEADLINE_OPTIONS = f"StartSel={HIGHLIGHT_START}, StopSel={HIGHLIGHT_STOP}, MaxFragments=2"
+
+
+def _dialect(db: AsyncSession) -> str:
+    return db.get_bind().dialect.name
+
+
+def _fts5_query(q: str) -> str:
+    """Quote each search term so user input cannot inject FTS5 operators"""
+    terms = re.findall(r"\w+", q)
+    return " ".join(f'"{term}"' for term in terms)
+
+
+async def index_note(db: AsyncSession, note_id: int, user_id: int, title: str, content: str) -> None:
+    """Add or refresh a note in the search index (within the caller's transaction)"""
+    await index_notes(db, [(note_id, user_id, title, content)])
+
+
+async def unindex_note(db: AsyncSession, note_id: int) -> None:
+    """Remove a note from the search index"""
+    await unindex_notes(db, [note_id])
+
+
+async def index_notes(db: AsyncSession, notes: Iterable[Tuple[int, int, str, str]]) -> None:
+    """Index (note_id, user_id, title, content) tuples with one executemany each"""
+    rows = [
+        {"note_id": note_id, "user_id": user_id, "title": title, "content": content}
+        for note_id, user_id, title, content in notes
+    ]
+    if not rows:
+        return
+
+    if _dialect(db) == "postgresql":
+        await db.execute(
+            text(
+                "UPDATE notes SET search_vector = "
+                "to_tsvector(CAST(:config AS regconfig), CAST(:title AS text) || ' ' || CAST(:content AS text)) "
+                "WHERE id = :note_id"
+            ),
+            [{**row, "config": settings.search_text_config} for row in rows],
+        )
+    else:
+        await unindex_notes(db, [row["note_id"] for row in rows])
+        await db.execute(
+            text("INSERT INTO notes_fts (rowid, user_id, title, content) VALUES (:note_id, :user_id, :title, :content)"),
+            rows,
+        )
+
+
+async def unindex_notes(db: AsyncSession, note_ids: List[int]) -> None:
+    """Remove notes from the search index"""
+    if not note_ids:
+        return
+    # On Postgres the tsvector lives on the note row itself
+    if _dialect(db) == "postgresql":
+        statement = text("UPDATE notes SET search_vector = NULL WHERE id = :note_id")
+    else:
+        statement = text("DELETE FROM notes_fts WHERE rowid = :note_id")
+    await db.execute(statement, [{"note_id": note_id} for note_id in note_ids])
+
+
+async def search_notes(
+    db: AsyncSession,
+    user_id: int,
+    q: str,
+    limit: int,
+    offset: int = 0,
+    highlight: bool = False,
+) -> List[Union[Row, Dict[str, Any]]]:
+    """Rank a user's notes against a search query, best match first"""
+    params = {"user_id": user_id, "limit": limit, "offset": offset}
+
+    if _dialect(db) == "postgresql":
+        # ts_headline cannot read compressed content, so those rows return
+        # the stored value and are highlighted afterwards
+        snippet = (
+            "CASE WHEN left(content, 1) = :marker THEN content "
+            "ELSE ts_headline(CAST(:config AS regconfig), content, query, :headline_options) END"
+            if highlight else "NULL"
+        )
+        statement = text(
+            f"SELECT id, title, created_at, updated_at, ts_rank(search_vector, query) AS rank, "
+            f"{snippet} AS snippet "
+            "FROM notes, websearch_to_tsquery(CAST(:config AS regconfig), :q) AS query "
+            "WHERE user_id = :user_id AND deleted_at IS NULL AND search_vector @@ query "
+            "ORDER BY rank DESC, id DESC LIMIT :limit OFFSET :offset"
+        )
+        params.update(config=settings.search_text_config, q=q, marker=MARKER, headline_options=HEADLINE_OPTIONS)
+    else:
+        match = _fts5_query(q)
+        if not match:
+            return []
+        snippet = (
+            f"snippet(notes_fts, 2, '{HIGHLIGHT_START}', '{HIGHLIGHT_STOP}', '…', 16)"
+            if highlight else "NULL"
+        )
+        # bm25() is lower-is-better; negate so rank sorts the same as ts_rank
+        statement = text(
+            f"SELECT notes.id, notes.title, notes.created_at, notes.updated_at, "
+            f"-bm25(notes_fts) AS rank, {snippet} AS snippet "
+            "FROM notes_fts JOIN notes ON notes.id = notes_fts.rowid "
+            "WHERE notes_fts MATCH :match AND notes_fts.user_id = :user_id "
+            "ORDER BY rank DESC, notes.id DESC LIMIT :limit OFFSET :offset"
+        )
+        params.update(match=match)
+
+    rows = list((await db.execute(statement, params)).all())
+    if highlight and _dialect(db) == "postgresql":
+        return await _highlight_compressed(db, rows, q)
+    return rows
+
+
+async def _highlight_compressed(db: AsyncSession, rows: List[Row], q: str) -> List[Union[Row, Dict[str, Any]]]:
+    """Run ts_headline over the decompressed content of compressed hits in one query"""
+    pending = [index for index, row in enumerate(rows) if row.snippet and row.snippet.startswith(MARKER)]
+    if not pending:
+        return rows
+
+    result = await db.execute(
+        text(
+            "SELECT ts_headline(CAST(:config AS regconfig), doc, "
+            "websearch_to_tsquery(CAST(:config AS regconfig), :q), :headline_options) "
+            "FROM unnest(CAST(:docs AS text[])) WITH ORDINALITY AS t(doc, n) ORDER BY n"
+        ),
+        {
+            "config": settings.search_text_config,
+            "q": q,
+            "headline_options": HEADLINE_OPTIONS,
+            "docs": [decompress_text(rows[index].snippet) for index in pending],
+        },
+    )
+    results: List[Union[Row, Dict[str, Any]]] = list(rows)
+    for index, headline in zip(pending, result.scalars()):
+        results[index] = {**rows[index]._mapping, "snippet": headline}
+    return results
+
+
+async def search_backfill_pending(db: AsyncSession) -> bool:
+    """Cheaply check whether any live note is missing from the search index"""
+    if _dialect(db) == "postgresql":
+        # Answered from the ix_notes_search_pending partial index
+        query = text("SELECT 1 FROM notes WHERE search_vector IS NULL AND deleted_at IS NULL LIMIT 1")
+        return (await db.execute(query)).first() is not None
+    # Every live note has exactly one FTS row once indexed, so equal counts
+    # mean there is nothing to do; any mismatch falls back to the full scan
+    query = text(
+        "SELECT (SELECT count(*) FROM notes WHERE deleted_at IS NULL) != (SELECT count(*) FROM notes_fts)"
+    )
+    return bool((await db.execute(query)).scalar())
+
+
+async def backfill_search_index(db: AsyncSession, batch_size: int = 500) -> int:
+    """Index notes written before search existed; returns the number indexed"""
+    # Tombstones (deleted_at set) are never indexed
+    if _dialect(db) == "postgresql":
+        missing = text("SELECT id FROM notes WHERE search_vector IS NULL AND deleted_at IS NULL")
+    else:
+        missing = text(
+            "SELECT id FROM notes WHERE deleted_at IS NULL AND id NOT IN (SELECT rowid FROM notes_fts)"
+        )
+    note_ids = list((await db.execute(missing)).scalars().all())
+
+    for start in range(0, len(note_ids), batch_size):
+        batch = note_ids[start:start + batch_size]
+        result = await db.execute(select(Note).where(Note.id.in_(batch)))
+        for note in result.scalars():
+            await index_note(db, note.id, note.user_id, note.title, note.content)
+        await db.commit()
+    return len(note_ids)
@@ -0,0 +1,139 @@
+import logging
+from datetime import datetime, timezone
+from typing import Any, AsyncIterable, AsyncIterator, Dict, List, Optional
+
+from pydantic import ValidationError
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..models.notes import Note, utcnow
+from ..schemas.notes import NoteImport, note_export_adapter, note_import_adapter
+from .changes import allocate_change_seqs
+from .search import index_notes
+
+logger = logging.getLogger(__name__)
+
+
+class LineTooLong(ValueError):
+    """An NDJSON line exceeded the import's line size limit"""
+
+
+async def export_notes(session_factory, user_id: int, batch_size: int) -> AsyncIterator[bytes]:
+    """Yield a user's live notes as NDJSON, oldest first, one batch of lines at a time
+
+    Rows come from a server-side cursor ``batch_size`` at a time, so memory
+    stays flat however many notes there are. The session is opened here
+    rather than injected because the body is sent after the handler returns.
+    """
+    query = (
+        select(Note.id, Note.title, Note.content, Note.version, Note.created_at, Note.updated_at)
+        .where(Note.user_id == user_id, Note.deleted_at.is_(None))
+        .order_by(Note.id)
+        .execution_options(yield_per=batch_size)
+    )
+    async with session_factory() as db:
+        result = await db.stream(query)
+        async for rows in result.partitions():
+            yield b"".join(
+                note_export_adapter.dump_json(note_export_adapter.validate_python(row, from_attributes=True)) + b"\n"
+                for row in rows
+            )
+
+
+async def iter_lines(chunks: AsyncIterable[bytes], max_line_bytes: int) -> AsyncIterator[bytes]:
+    """Split a byte stream into lines without holding more than one line at a time"""
+    buffer = bytearray()
+    async for chunk in chunks:
+        start = 0
+        while (end := chunk.find(b"\n", start)) >= 0:
+            buffer += chunk[start:end]
+            if len(buffer) > max_line_bytes:
+                raise LineTooLong(f"Line longer than {max_line_bytes} bytes")
+            yield bytes(buffer)
+            buffer.clear()
+            start = end + 1
+        buffer += chunk[start:]
+        if len(buffer) > max_line_bytes:
+            raise LineTooLong(f"Line longer than {max_line_bytes} bytes")
+    if buffer:
+        yield bytes(buffer)
+
+
+def _utc(value: Optional[datetime]) -> Optional[datetime]:
+    """Naive UTC, as the DateTime columns store it; naive input is taken to be UTC"""
+    if value is None or value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+async def _insert_batch(db: AsyncSession, user_id: int, notes: List[NoteImport]) -> None:
+    now = utcnow()
+    next_seq = await allocate_change_seqs(db, user_id, len(notes)) - len(notes) + 1
+    rows = []
+    for offset, note in enumerate(notes):
+        created_at = _utc(note.created_at) or now
+        rows.append({
+            "user_id": user_id,
+            "title": note.title,
+            "content": note.content,
+            "created_at": created_at,
+            "updated_at": _utc(note.updated_at) or created_at,
+            "change_seq": next_seq + offset,
+        })
+    inserted = await db.execute(insert(Note).returning(Note.id, sort_by_parameter_order=True), rows)
+    await index_notes(db, [
+        (note_id, user_id, row["title"], row["content"])
+        for note_id, row in zip(inserted.scalars().all(), rows)
+    ])
+    await db.commit()
+
+
+async def import_notes(
+    db: AsyncSession,
+    user_id: int,
+    lines: AsyncIterable[bytes],
+    batch_size: int,
+    max_errors: int,
+) -> Dict[str, Any]:
+    """Create notes from NDJSON lines, committing every ``batch_size`` notes
+
+    Invalid lines are skipped and reported by line number (up to
+    ``max_errors`` of them); a line too long to buffer stops the import.
+    Each batch is its own transaction, so a failure part way leaves the
+    earlier batches imported.
+    """
+    imported = failed = batches = 0
+    errors: List[Dict[str, Any]] = []
+    batch: List[NoteImport] = []
+    line_number = 0
+
+    try:
+        async for line in lines:
+            line_number += 1
+            if not line.strip():
+                continue
+            try:
+                batch.append(note_import_adapter.validate_json(line))
+            except ValidationError as e:
+                failed += 1
+                if len(errors) < max_errors:
+                    errors.append({"line": line_number, "error": e.errors(include_url=False)[0]["msg"]})
+                continue
+
+            if len(batch) >= batch_size:
+                await _insert_batch(db, user_id, batch)
+                imported += len(batch)
+                batches += 1
+                batch = []
+                logger.info("Imported %d notes for user %d", imported, user_id)
+    except LineTooLong as e:
+        # An oversized line ends the import; the notes before it are kept
+        failed += 1
+        errors.append({"line": line_number + 1, "error": str(e)})
+
+    if batch:
+        await _insert_batch(db, user_id, batch)
+        imported += len(batch)
+        batches += 1
+
+    return {"imported": imported, "failed": failed, "batches": batches, "errors": errors}
@@ -0,0 +1,32 @@
+"""Compress existing note content that is over the configured threshold
+
+New and updated notes are compressed on write; this rewrites rows stored
+before compression was enabled (or before the threshold was lowered).
+Safe to interrupt and re-run, and to run alongside live traffic: notes
+edited mid-batch are skipped rather than overwritten. Run from this
+directory:
+
+    uv run python compress_notes.py --batch-size 500 --pause 0.1
+"""
+import argparse
+import asyncio
+
+from app.models.db import AsyncSessionLocal, engine
+from app.services.compression import compress_existing_notes
+
+
+async def main(args: argparse.Namespace) -> None:
+    async with AsyncSessionLocal() as db:
+        rewritten = await compress_existing_notes(
+            db, batch_size=args.batch_size, pause_seconds=args.pause, max_batches=args.max_batches
+        )
+    await engine.dispose()
+    print(f"Compressed {rewritten} notes")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--batch-size", type=int, default=500, help="Rows read and committed per batch")
+    parser.add_argument("--pause", type=float, default=0.0, help="Seconds to sleep between batches")
+    parser.add_argument("--max-batches", type=int, default=None, help="Stop after this many batches")
+    asyncio.run(main(parser.parse_args()))
@@ -1,7 +1,55 @@
+import asyncio
+from contextlib import asynccontextmanager, suppress
+from datetime import timedelta
+
 from fastapi import FastAPI
+from fastapi.responses import JSONResponse
 from app.routers import notes
-from app.models.db import create_tables
+from app.models.db import AsyncSessionLocal, create_tables, engine
+from app.services.changes import backfill_change_seqs, change_seq_backfill_pending, compact_tombstones_periodically
+from app.services.search import backfill_search_index, search_backfill_pending
 from app.config import settings
+from shared.compression import CompressionMiddleware
+from shared.database import pool_stats, warm_up_async_pool
+from shared.deadline import DeadlineMiddleware
+from shared.health import check_async_database, liveness_response, readiness_response
+from shared.metrics import CACHE_STATS, DB_POOL_STATS, MetricsMiddleware, metrics_endpoint
+from shared.query_budget import QueryStatsMiddleware
+from shared.serialization import ORJSONResponse
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Prepare the database, warm DB and auth-client connections, then mark ready"""
+    app.state.ready = False
+    if settings.db_create_tables:
+        await create_tables()
+    async with AsyncSessionLocal() as db:
+        # Skip the backfill scans when a previous start already finished them
+        if await search_backfill_pending(db):
+            await backfill_search_index(db)
+        if await change_seq_backfill_pending(db):
+            await backfill_change_seqs(db)
+    await warm_up_async_pool(engine, settings.db_warmup_connections)
+    await notes.auth_client.start()
+    # The auth service may still be starting; readiness reports it until it is up
+    await notes.auth_client.warm_up(
+        settings.auth_client_warmup_connections, settings.readiness_timeout_seconds
+    )
+    compaction = None
+    if settings.tombstone_compaction_interval_seconds > 0:
+        compaction = asyncio.create_task(compact_tombstones_periodically(
+            AsyncSessionLocal,
+            settings.tombstone_compaction_interval_seconds,
+            timedelta(days=settings.tombstone_retention_days),
+        ))
+    app.state.ready = True
+    yield
+    app.state.ready = False
+    if compaction is not None:
+        compaction.cancel()
+        with suppress(asyncio.CancelledError):
+            await compaction
+    await notes.auth_client.aclose()
 
 
 app = FastAPI(
@@ -9,16 +57,50 @@ app = FastAPI(
     debug=settings.debug,
     ignore_trailing_slash=True,
     root_path="/note",
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse if settings.fast_serialization else JSONResponse,
 )
 
-@app.on_event("startup")
-async def startup_event():
-    """Create database tables on startup"""
-    create_tables()
+if settings.compression_enabled:
+    app.add_middleware(
+        CompressionMiddleware,
+        minimum_size=settings.compression_minimum_size,
+        gzip_level=settings.compression_gzip_level,
+        brotli_quality=settings.compression_brotli_quality,
+    )
+
+app.add_middleware(DeadlineMiddleware, timeout=settings.request_timeout_seconds)
+
+if settings.debug or settings.query_stats_headers or settings.query_budgets:
+    app.add_middleware(
+        QueryStatsMiddleware,
+        headers=settings.debug or settings.query_stats_headers,
+        budgets=settings.query_budgets,
+    )
+
+# Added last so it is outermost and times the whole request, compression included
+if settings.metrics_enabled:
+    app.add_middleware(MetricsMiddleware, service="notes")
+    app.add_route("/metrics", metrics_endpoint, include_in_schema=False)
+    DB_POOL_STATS.add(lambda: pool_stats(engine.sync_engine), "notes")
+    # Looked up at scrape time, since the combined app swaps the client out
+    CACHE_STATS.add(lambda: notes.auth_client.cache_stats(), "notes", "auth_token")
 
 # Include routers
 app.include_router(notes.router)
 
+@app.get("/healthz", include_in_schema=False)
+def healthz():
+    return liveness_response()
+
+@app.get("/readyz", include_in_schema=False)
+async def readyz():
+    timeout = settings.readiness_timeout_seconds
+    return readiness_response(getattr(app.state, "ready", False), {
+        "database": await check_async_database(engine, timeout),
+        "auth_service": await notes.auth_client.is_available(timeout),
+    })
+
 @app.get("/")
 def read_root():
     return {"service": settings.app_name}
@@ -0,0 +1,158 @@
+import logging
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional
+
+try:
+    import redis
+except ImportError:  # optional: install shared[redis]
+    redis = None
+
+logger = logging.getLogger(__name__)
+
+
+class TTLCache:
+    """Bounded in-process LRU cache whose entries expire after a TTL
+
+    Not thread-safe; intended for use from a single event loop.
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl: float = 60.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[Hashable, tuple[float, Any]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Return the cached value, or None if missing or expired"""
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        """Store a value, evicting the least recently used entry when full"""
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        if ttl <= 0 or self.max_entries <= 0:
+            return
+
+        self._entries[key] = (time.monotonic() + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def delete(self, key: Hashable) -> None:
+        """Remove a key if present"""
+        self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        """Remove all entries"""
+        self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return hit/miss/eviction counters and current size"""
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "size": len(self._entries),
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+class SharedCacheBackend(ABC):
+    """Byte-oriented key/value store shared between processes (e.g. Redis)
+
+    Implementations must be safe to call from multiple threads.
+    """
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[bytes]:
+        """Return the value, or None if missing or expired"""
+
+    @abstractmethod
+    def set(self, key: str, value: bytes, ttl: float) -> None:
+        """Store a value for ``ttl`` seconds"""
+
+    @abstractmethod
+    def delete(self, key: str) -> None:
+        """Remove a key if present"""
+
+
+class InMemorySharedCacheBackend(SharedCacheBackend):
+    """Process-local stand-in for a shared cache backend, for tests and local runs"""
+
+    def __init__(self):
+        self._entries: Dict[str, tuple[float, bytes]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            return value
+
+    def set(self, key: str, value: bytes, ttl: float) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+
+class RedisSharedCacheBackend(SharedCacheBackend):
+    """SharedCacheBackend on Redis
+
+    The client's connection pool is thread-safe. Redis errors are logged
+    and treated as misses, so an unavailable cache slows lookups down
+    instead of failing them; a failed delete leaves the entry to expire.
+    """
+
+    def __init__(self, url: str, timeout: float = 0.5):
+        if redis is None:
+            raise RuntimeError("The Redis cache backend needs the redis package; install shared[redis]")
+        self.client = redis.Redis.from_url(url, socket_timeout=timeout, socket_connect_timeout=timeout)
+
+    def get(self, key: str) -> Optional[bytes]:
+        try:
+            return self.client.get(key)
+        except redis.RedisError:
+            logger.warning("Redis cache get failed", exc_info=True)
+            return None
+
+    def set(self, key: str, value: bytes, ttl: float) -> None:
+        try:
+            self.client.set(key, value, px=max(1, int(ttl * 1000)))
+        except redis.RedisError:
+            logger.warning("Redis cache set failed", exc_info=True)
+
+    def delete(self, key: str) -> None:
+        try:
+            self.client.delete(key)
+        except redis.RedisError:
+            logger.warning("Redis cache delete failed", exc_info=True)
@@ -0,0 +1,95 @@
+import time
+from typing import Any, Dict
+
+from .metrics import CIRCUIT_BREAKER_REJECTIONS, CIRCUIT_BREAKER_STATE
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+# Gauge values for each state
+STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker for one upstream service
+
+    After ``failure_threshold`` consecutive failures the circuit opens and
+    calls are rejected for ``reset_timeout`` seconds. It then goes half-open
+    and lets up to ``half_open_max_calls`` probe calls through: a success
+    closes the circuit, a failure opens it again. Not thread-safe; intended
+    for use from a single event loop.
+    """
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 10.0, half_open_max_calls: int = 1):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.half_open_max_calls = half_open_max_calls
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.half_open_calls = 0
+        self.rejections = 0
+        self.times_opened = 0
+        CIRCUIT_BREAKER_STATE.labels(name).set(STATE_VALUES[CLOSED])
+
+    def _set_state(self, state: str) -> None:
+        self.state = state
+        self.half_open_calls = 0
+        if state == OPEN:
+            self.opened_at = time.monotonic()
+            self.times_opened += 1
+        CIRCUIT_BREAKER_STATE.labels(self.name).set(STATE_VALUES[state])
+
+    def retry_after(self) -> float:
+        """Seconds until an open circuit will allow a probe"""
+        if self.state != OPEN:
+            return 0.0
+        return max(0.0, self.opened_at + self.reset_timeout - time.monotonic())
+
+    def allow(self) -> bool:
+        """Return True if a call may proceed; every allowed call must be recorded"""
+        if self.state == OPEN and self.retry_after() <= 0:
+            self._set_state(HALF_OPEN)
+
+        if self.state == CLOSED:
+            return True
+        if self.state == HALF_OPEN and self.half_open_calls < self.half_open_max_calls:
+            self.half_open_calls += 1
+            return True
+
+        self.rejections += 1
+        CIRCUIT_BREAKER_REJECTIONS.labels(self.name).inc()
+        return False
+
+    def record_success(self) -> None:
+        self.consecutive_failures = 0
+        if self.state != CLOSED:
+            self._set_state(CLOSED)
+
+    def record_failure(self) -> None:
+        self.consecutive_failures += 1
+        if self.state == HALF_OPEN or (
+            self.state == CLOSED and self.consecutive_failures >= self.failure_threshold
+        ):
+            self._set_state(OPEN)
+
+    def record_abandoned(self) -> None:
+        """Release a half-open probe slot for a call that was cancelled before it finished"""
+        if self.state == HALF_OPEN and self.half_open_calls > 0:
+            self.half_open_calls -= 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Return state, thresholds and counters"""
+        return {
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "failure_threshold": self.failure_threshold,
+            "reset_timeout": self.reset_timeout,
+            "half_open_max_calls": self.half_open_max_calls,
+            "half_open_calls": self.half_open_calls,
+            "retry_after": self.retry_after(),
+            "rejections": self.rejections,
+            "times_opened": self.times_opened,
+        }
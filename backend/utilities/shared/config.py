@@ -1,3 +1,5 @@
+from typing import Any, Dict, Optional
+
 from pydantic import Field
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
@@ -19,9 +21,110 @@ class BaseServiceSettings(BaseSettings):
     database_url: str = Field(
         description="Database URL for SQLAlchemy"
     )
+    db_pool_size: int = Field(
+        default=5,
+        description="Connections kept open in the database pool"
+    )
+    db_max_overflow: int = Field(
+        default=10,
+        description="Extra connections allowed beyond the pool size under load"
+    )
+    db_pool_timeout: float = Field(
+        default=30.0,
+        description="Seconds to wait for a pooled connection before failing"
+    )
+    db_pool_recycle: int = Field(
+        default=1800,
+        description="Seconds after which pooled connections are replaced (-1 disables)"
+    )
+    db_pool_pre_ping: bool = Field(
+        default=True,
+        description="Test connections on checkout so stale ones (e.g. after failover) are replaced"
+    )
+    db_statement_timeout_ms: Optional[int] = Field(
+        default=None,
+        description="Postgres statement_timeout in milliseconds"
+    )
+    sqlite_busy_timeout_ms: int = Field(
+        default=5000,
+        description="SQLite busy timeout in milliseconds"
+    )
+    sqlite_mmap_size: int = Field(
+        default=268435456,
+        description="SQLite mmap_size in bytes (0 disables memory-mapped I/O)"
+    )
+    sqlite_wal: bool = Field(
+        default=True,
+        description="Use SQLite WAL journal mode with synchronous=NORMAL"
+    )
+    db_create_tables: bool = Field(
+        default=True,
+        description="Run create_all on startup (disable in production where migrations own the schema)"
+    )
+    db_warmup_connections: int = Field(
+        default=2,
+        description="Pool connections to open on startup, capped at db_pool_size"
+    )
+    request_timeout_seconds: Optional[float] = Field(
+        default=15.0,
+        description="Time budget per request; calls to other services must finish within what is left"
+    )
+    readiness_timeout_seconds: float = Field(
+        default=2.0,
+        description="Timeout for each dependency check made by /readyz"
+    )
+
+    @property
+    def database_engine_options(self) -> Dict[str, Any]:
+        """Keyword arguments for shared.database engine factories"""
+        return {
+            "pool_size": self.db_pool_size,
+            "max_overflow": self.db_max_overflow,
+            "pool_timeout": self.db_pool_timeout,
+            "pool_recycle": self.db_pool_recycle,
+            "pool_pre_ping": self.db_pool_pre_ping,
+            "statement_timeout_ms": self.db_statement_timeout_ms,
+            "sqlite_busy_timeout_ms": self.sqlite_busy_timeout_ms,
+            "sqlite_mmap_size": self.sqlite_mmap_size,
+            "sqlite_wal": self.sqlite_wal,
+        }
 
     # App settings
     debug: bool = Field(
         default=False,
         description="Debug mode"
     )
+    metrics_enabled: bool = Field(
+        default=True,
+        description="Record request/DB/upstream metrics and serve them at /metrics"
+    )
+    query_stats_headers: bool = Field(
+        default=False,
+        description="Report each request's SQL query count and DB time in X-DB-Query-Count/X-DB-Time-Ms headers (always on in debug mode)"
+    )
+    query_budgets: Dict[str, int] = Field(
+        default_factory=dict,
+        description='Most SQL statements a route may run, e.g. {"GET /notes": 1}; overruns are logged'
+    )
+
+    # Response performance settings
+    fast_serialization: bool = Field(
+        default=False,
+        description="Serialize hot responses with prebuilt TypeAdapters and orjson"
+    )
+    compression_enabled: bool = Field(
+        default=False,
+        description="Compress responses with brotli or gzip"
+    )
+    compression_minimum_size: int = Field(
+        default=1024,
+        description="Smallest response body in bytes that gets compressed"
+    )
+    compression_gzip_level: int = Field(
+        default=6,
+        description="gzip compression level (1-9)"
+    )
+    compression_brotli_quality: int = Field(
+        default=4,
+        description="brotli compression quality (0-11)"
+    )
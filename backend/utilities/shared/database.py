@@ -1,17 +1,155 @@
-from sqlalchemy import create_engine
+import asyncio
+import time
+from contextlib import AsyncExitStack
+from typing import Any, Dict, Optional
+
+from sqlalchemy import create_engine, event, exc, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+from .metrics import instrument_engine
+from .query_budget import track_queries
+
+
+# Async drivers used for each sync backend name
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+}
+
+
+class PoolStats:
+    """Connection checkout counters and wait times for a pool"""
+
+    def __init__(self):
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+
+    def record(self, waited: float) -> None:
+        self.checkouts += 1
+        self.wait_seconds_total += waited
+        self.wait_seconds_max = max(self.wait_seconds_max, waited)
+
+
+class _TimedPoolMixin:
+    """Measures how long each checkout waits for a free connection"""
+
+    stats: PoolStats
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stats = PoolStats()
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except exc.TimeoutError:
+            self.stats.timeouts += 1
+            raise
+        self.stats.record(time.perf_counter() - started)
+        return connection
+
+    def recreate(self):
+        # Keep counters across dispose()/invalidation
+        pool = super().recreate()
+        pool.stats = self.stats
+        return pool
+
+
+class TimedQueuePool(_TimedPoolMixin, QueuePool):
+    pass
+
+
+class TimedAsyncAdaptedQueuePool(_TimedPoolMixin, AsyncAdaptedQueuePool):
+    pass
+
+
+def _is_memory_sqlite(url) -> bool:
+    return url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:")
+
+
+def _engine_arguments(
+    url,
+    is_async: bool,
+    pool_size: int,
+    max_overflow: int,
+    pool_timeout: float,
+    pool_recycle: int,
+    pool_pre_ping: bool,
+    statement_timeout_ms: Optional[int],
+) -> Dict[str, Any]:
+    arguments: Dict[str, Any] = {"pool_pre_ping": pool_pre_ping}
+    connect_args: Dict[str, Any] = {}
+
+    if url.get_backend_name() == "sqlite":
+        if not is_async:
+            connect_args["check_same_thread"] = False
+    elif url.get_backend_name() == "postgresql" and statement_timeout_ms:
+        if is_async:
+            connect_args["server_settings"] = {"statement_timeout": str(statement_timeout_ms)}
+        else:
+            connect_args["options"] = f"-c statement_timeout={statement_timeout_ms}"
+
+    # In-memory SQLite keeps its single-connection pool
+    if not _is_memory_sqlite(url):
+        arguments.update(
+            poolclass=TimedAsyncAdaptedQueuePool if is_async else TimedQueuePool,
+            pool_size=pool_size,
+            max_overflow=max_overflow,
+            pool_timeout=pool_timeout,
+            pool_recycle=pool_recycle,
+        )
+    if connect_args:
+        arguments["connect_args"] = connect_args
+    return arguments
 
 
-def create_database_engine(database_url: str):
+def _apply_sqlite_pragmas(engine, busy_timeout_ms: int, mmap_size: int, wal: bool) -> None:
+    """Set per-connection SQLite pragmas whenever the pool opens a connection"""
+    @event.listens_for(engine, "connect")
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        if wal:
+            cursor.execute("PRAGMA journal_mode=WAL")
+            cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute(f"PRAGMA busy_timeout={int(busy_timeout_ms)}")
+        if mmap_size:
+            cursor.execute(f"PRAGMA mmap_size={int(mmap_size)}")
+        cursor.close()
+
+
+def create_database_engine(
+    database_url: str,
+    pool_size: int = 5,
+    max_overflow: int = 10,
+    pool_timeout: float = 30.0,
+    pool_recycle: int = -1,
+    pool_pre_ping: bool = False,
+    statement_timeout_ms: Optional[int] = None,
+    sqlite_busy_timeout_ms: int = 5000,
+    sqlite_mmap_size: int = 0,
+    sqlite_wal: bool = True,
+):
     """Create SQLAlchemy engine with appropriate settings"""
-    if database_url.startswith("sqlite"):
-        engine = create_engine(
-            database_url, connect_args={"check_same_thread": False}
+    url = make_url(database_url)
+    engine = create_engine(
+        url,
+        **_engine_arguments(
+            url, False, pool_size, max_overflow, pool_timeout,
+            pool_recycle, pool_pre_ping, statement_timeout_ms,
         )
-    else:
-        # For PostgreSQL and other databases
-        engine = create_engine(database_url)
+    )
+    if url.get_backend_name() == "sqlite":
+        wal = sqlite_wal and not _is_memory_sqlite(url)
+        _apply_sqlite_pragmas(engine, sqlite_busy_timeout_ms, sqlite_mmap_size, wal)
+    instrument_engine(engine)
+    track_queries(engine)
     return engine
 
 
@@ -31,5 +169,117 @@ def get_database_dependency(SessionLocal):
     return get_db
 
 
+def to_async_database_url(database_url: str) -> str:
+    """Rewrite a sync database URL to use an asyncio driver (asyncpg/aiosqlite)"""
+    url = make_url(database_url)
+    drivername = ASYNC_DRIVERS.get(url.get_backend_name())
+    if drivername is not None:
+        url = url.set(drivername=drivername)
+    return url.render_as_string(hide_password=False)
+
+
+def create_async_database_engine(
+    database_url: str,
+    pool_size: int = 5,
+    max_overflow: int = 10,
+    pool_timeout: float = 30.0,
+    pool_recycle: int = -1,
+    pool_pre_ping: bool = False,
+    statement_timeout_ms: Optional[int] = None,
+    sqlite_busy_timeout_ms: int = 5000,
+    sqlite_mmap_size: int = 0,
+    sqlite_wal: bool = True,
+):
+    """Create an AsyncEngine for the given (sync or async) database URL"""
+    url = make_url(to_async_database_url(database_url))
+    engine = create_async_engine(
+        url,
+        **_engine_arguments(
+            url, True, pool_size, max_overflow, pool_timeout,
+            pool_recycle, pool_pre_ping, statement_timeout_ms,
+        )
+    )
+    if url.get_backend_name() == "sqlite":
+        wal = sqlite_wal and not _is_memory_sqlite(url)
+        _apply_sqlite_pragmas(engine.sync_engine, sqlite_busy_timeout_ms, sqlite_mmap_size, wal)
+    instrument_engine(engine.sync_engine)
+    track_queries(engine.sync_engine)
+    return engine
+
+
+def create_async_session_local(engine):
+    """Create AsyncSessionLocal class for async database sessions"""
+    # expire_on_commit=False so committed objects can still be serialized
+    # without an implicit (and, under asyncio, illegal) lazy refresh
+    return async_sessionmaker(bind=engine, autoflush=False, expire_on_commit=False)
+
+
+def get_async_database_dependency(AsyncSessionLocal):
+    """Create async database dependency function"""
+    async def get_db():
+        async with AsyncSessionLocal() as db:
+            yield db
+    return get_db
+
+
+def _warmup_count(engine, connections: int) -> int:
+    # Only connections the pool keeps are worth opening; overflow is discarded
+    pool = engine.pool
+    if isinstance(pool, QueuePool):
+        return min(connections, pool.size())
+    return min(connections, 1)
+
+
+def warm_up_pool(engine, connections: int) -> int:
+    """Open up to ``connections`` pooled connections at once so first requests skip connect"""
+    count = _warmup_count(engine, connections)
+    opened = []
+    try:
+        for _ in range(count):
+            connection = engine.connect()
+            opened.append(connection)
+            connection.execute(text("SELECT 1"))
+    finally:
+        for connection in opened:
+            connection.close()
+    return count
+
+
+async def warm_up_async_pool(engine, connections: int) -> int:
+    """Async counterpart of warm_up_pool for an AsyncEngine"""
+    count = _warmup_count(engine.sync_engine, connections)
+    async with AsyncExitStack() as stack:
+        opened = await asyncio.gather(*(
+            stack.enter_async_context(engine.connect()) for _ in range(count)
+        ))
+        for connection in opened:
+            await connection.execute(text("SELECT 1"))
+    return count
+
+
+def pool_stats(engine) -> Dict[str, Any]:
+    """Return pool occupancy and checkout wait statistics for an engine"""
+    pool = engine.pool
+    stats: Dict[str, Any] = {"pool_class": type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        stats.update(
+            size=pool.size(),
+            checked_in=pool.checkedin(),
+            checked_out=pool.checkedout(),
+            overflow=pool.overflow(),
+        )
+
+    timed: Optional[PoolStats] = getattr(pool, "stats", None)
+    if timed is not None:
+        stats.update(
+            checkouts=timed.checkouts,
+            timeouts=timed.timeouts,
+            wait_seconds_total=timed.wait_seconds_total,
+            wait_seconds_max=timed.wait_seconds_max,
+            wait_seconds_avg=timed.wait_seconds_total / timed.checkouts if timed.checkouts else 0.0,
+        )
+    return stats
+
+
 # Base class for all models
-Base = declarative_base()
\ No newline at end of file
+Base = declarative_base()
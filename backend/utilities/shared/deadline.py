@@ -0,0 +1,69 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, Optional
+
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+# Header carrying a caller's remaining budget in milliseconds; outgoing
+# service calls send it so the next hop can stop work the caller gave up on
+DEADLINE_HEADER = "x-request-timeout-ms"
+
+_deadline: ContextVar[Optional[float]] = ContextVar("request_deadline", default=None)
+
+
+def remaining_time() -> Optional[float]:
+    """Seconds left in the current request's budget, or None if unbounded"""
+    deadline = _deadline.get()
+    if deadline is None:
+        return None
+    return deadline - time.monotonic()
+
+
+@contextmanager
+def deadline_scope(seconds: Optional[float]) -> Iterator[None]:
+    """Bound the enclosed work to ``seconds`` (never extending an outer deadline)"""
+    if seconds is None:
+        yield
+        return
+
+    deadline = time.monotonic() + seconds
+    outer = _deadline.get()
+    if outer is not None:
+        deadline = min(deadline, outer)
+    token = _deadline.set(deadline)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+class DeadlineMiddleware:
+    """Give each request a time budget that downstream service calls must fit in
+
+    The budget is ``timeout`` seconds, shortened by an incoming
+    X-Request-Timeout-Ms header when the caller has less time left.
+    """
+
+    def __init__(self, app: ASGIApp, timeout: Optional[float]):
+        self.app = app
+        self.timeout = timeout
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        budget = self.timeout
+        header = Headers(scope=scope).get(DEADLINE_HEADER)
+        if header is not None:
+            try:
+                caller_budget = max(0.0, int(header) / 1000)
+            except ValueError:
+                caller_budget = None
+            if caller_budget is not None:
+                budget = caller_budget if budget is None else min(budget, caller_budget)
+
+        with deadline_scope(budget):
+            await self.app(scope, receive, send)
@@ -0,0 +1,53 @@
+import hashlib
+from typing import Any, Optional
+
+# Content codings CompressionMiddleware applies; each gets its own strong ETag
+CONTENT_CODINGS = ("br", "gzip")
+
+
+def make_etag(*parts: Any) -> str:
+    """Build a strong, quoted ETag from the given version-identifying parts"""
+    digest = hashlib.sha256("|".join(str(part) for part in parts).encode()).hexdigest()
+    return f'"{digest[:32]}"'
+
+
+def encoded_etag(etag: str, encoding: str) -> str:
+    """ETag of a content-coded representation: a strong ETag gets a -<encoding> suffix
+
+    The compressed and identity bodies differ byte for byte, so they must not
+    share a strong validator. Weak ETags are returned unchanged.
+    """
+    if etag.startswith("W/") or not etag.endswith('"'):
+        return etag
+    return f'{etag[:-1]}-{encoding}"'
+
+
+def _without_coding(etag: str) -> str:
+    for coding in CONTENT_CODINGS:
+        suffix = f'-{coding}"'
+        if etag.endswith(suffix):
+            return etag[:-len(suffix)] + '"'
+    return etag
+
+
+def etag_matches(header: Optional[str], etag: str, weak: bool = True) -> bool:
+    """Check an If-None-Match (weak) or If-Match (strong) header against an ETag
+
+    Handles comma-separated lists and "*". Strong comparison never matches
+    weak (W/) validators, per RFC 9110. Validators from encoded_etag match
+    the ETag they were derived from, whatever the coding.
+    """
+    if not header:
+        return False
+
+    for candidate in header.split(","):
+        candidate = candidate.strip()
+        if candidate == "*":
+            return True
+        if candidate.startswith("W/"):
+            if not weak:
+                continue
+            candidate = candidate[2:]
+        if _without_coding(candidate) == etag:
+            return True
+    return False
@@ -0,0 +1,56 @@
+import asyncio
+from typing import Dict
+
+from fastapi import status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse
+from sqlalchemy import text
+
+
+def check_database(engine) -> bool:
+    """Run SELECT 1 on a sync engine; False if the database is unreachable"""
+    try:
+        with engine.connect() as connection:
+            connection.execute(text("SELECT 1"))
+        return True
+    except Exception:
+        return False
+
+
+async def check_database_within(engine, timeout: float) -> bool:
+    """Run check_database on a worker thread, giving up after ``timeout`` seconds
+
+    A hung connection attempt keeps its thread until the driver gives up,
+    but the probe itself answers in time.
+    """
+    try:
+        return await asyncio.wait_for(run_in_threadpool(check_database, engine), timeout)
+    except Exception:
+        return False
+
+
+async def check_async_database(engine, timeout: float) -> bool:
+    """Run SELECT 1 on an AsyncEngine within ``timeout`` seconds"""
+    async def ping():
+        async with engine.connect() as connection:
+            await connection.execute(text("SELECT 1"))
+
+    try:
+        await asyncio.wait_for(ping(), timeout)
+        return True
+    except Exception:
+        return False
+
+
+def liveness_response() -> Dict[str, str]:
+    """Liveness only says the process is serving; it never checks dependencies"""
+    return {"status": "ok"}
+
+
+def readiness_response(ready: bool, checks: Dict[str, bool]) -> JSONResponse:
+    """200 when started and every check passed, otherwise 503 with the failing checks"""
+    ok = ready and all(checks.values())
+    return JSONResponse(
+        {"status": "ready" if ok else "unavailable", "started": ready, "checks": checks},
+        status_code=status.HTTP_200_OK if ok else status.HTTP_503_SERVICE_UNAVAILABLE,
+    )
@@ -0,0 +1,74 @@
+from datetime import datetime
+from typing import Any, Dict, Iterable, Optional
+
+try:
+    from jose import JWTError, jwk, jwt
+except ImportError:  # optional: install shared[jwt]
+    jwt = None
+
+from .schemas.user import UserResponse
+
+# Asymmetric algorithms a published key can verify
+VERIFY_ALGORITHMS = ("RS256", "RS384", "RS512", "ES256", "ES384", "ES512")
+
+
+class UnknownSigningKey(Exception):
+    """The token names a key id that is not in the current key set"""
+
+
+class InvalidToken(Exception):
+    """The token's signature, expiry or claims are not valid"""
+
+
+class JWKSVerifier:
+    """Verifies access tokens against a JWK Set published by the auth service"""
+
+    def __init__(self, algorithms: Iterable[str] = VERIFY_ALGORITHMS):
+        if jwt is None:
+            raise RuntimeError("Local token verification needs python-jose; install shared[jwt]")
+        self.algorithms = list(algorithms)
+        self._keys: Dict[str, Any] = {}
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def load(self, jwks: Dict[str, Any]) -> None:
+        """Replace the key set with the keys in a JWK Set document"""
+        keys = {}
+        for key in jwks.get("keys", []):
+            if key.get("kid") and key.get("alg") in self.algorithms:
+                keys[key["kid"]] = jwk.construct(key, key["alg"])
+        self._keys = keys
+
+    @staticmethod
+    def key_id(token: str) -> Optional[str]:
+        """The ``kid`` header of a token, or None for tokens signed with a shared secret"""
+        try:
+            return jwt.get_unverified_header(token).get("kid")
+        except JWTError:
+            return None
+
+    def verify(self, token: str) -> Dict[str, Any]:
+        """Return the verified claims of an access token"""
+        key = self._keys.get(self.key_id(token))
+        if key is None:
+            raise UnknownSigningKey()
+        try:
+            claims = jwt.decode(token, key, algorithms=self.algorithms)
+        except JWTError as e:
+            raise InvalidToken() from e
+        if claims.get("type") != "access":
+            raise InvalidToken()
+        return claims
+
+    @staticmethod
+    def user_from_claims(claims: Dict[str, Any]) -> Optional[UserResponse]:
+        """Build a UserResponse from identity claims, or None if the token has none"""
+        if claims.get("uid") is None or claims.get("created_at") is None:
+            return None
+        return UserResponse(
+            id=claims["uid"],
+            username=claims["sub"],
+            first_name=claims.get("first_name", ""),
+            created_at=datetime.fromisoformat(claims["created_at"]),
+        )
@@ -0,0 +1,241 @@
+import logging
+import time
+from typing import Any, Callable, Dict, List, Mapping, Sequence, Tuple
+
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, Counter, Gauge, Histogram, generate_latest
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+from sqlalchemy import event
+from starlette.requests import Request
+from starlette.responses import Response
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+logger = logging.getLogger(__name__)
+
+# Metrics live in prometheus_client's default registry. They are defined
+# once here so every service (and both services in one process) shares them.
+
+HTTP_REQUESTS = Counter(
+    "http_requests_total",
+    "HTTP requests handled, by route template and status code",
+    ["service", "method", "route", "status"],
+)
+HTTP_REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency until the response body is sent",
+    ["service", "method", "route"],
+)
+HTTP_REQUESTS_IN_PROGRESS = Gauge(
+    "http_requests_in_progress",
+    "HTTP requests currently being handled",
+    ["service", "method"],
+)
+RATE_LIMITED = Counter(
+    "http_requests_rate_limited_total",
+    "Requests rejected (ip, concurrency) or delayed (user_delayed) by admission control",
+    ["service", "route", "reason"],
+)
+
+DB_QUERIES = Counter(
+    "db_queries_total",
+    "SQL statements executed, by statement type",
+    ["operation"],
+)
+DB_QUERY_ERRORS = Counter(
+    "db_query_errors_total",
+    "SQL statements that raised a database error",
+    ["operation"],
+)
+DB_QUERY_DURATION = Histogram(
+    "db_query_duration_seconds",
+    "SQL statement execution time",
+    ["operation"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5),
+)
+
+UPSTREAM_REQUESTS = Counter(
+    "upstream_requests_total",
+    "Service-to-service HTTP calls, by upstream and status (or error kind)",
+    ["upstream", "method", "status"],
+)
+UPSTREAM_REQUEST_DURATION = Histogram(
+    "upstream_request_duration_seconds",
+    "Service-to-service HTTP call latency",
+    ["upstream", "method"],
+)
+UPSTREAM_RETRIES = Counter(
+    "upstream_retries_total",
+    "Service-to-service calls retried after a transient failure",
+    ["upstream", "method"],
+)
+CIRCUIT_BREAKER_STATE = Gauge(
+    "upstream_circuit_breaker_state",
+    "Circuit breaker state per upstream (0 closed, 1 half-open, 2 open)",
+    ["upstream"],
+)
+CIRCUIT_BREAKER_REJECTIONS = Counter(
+    "upstream_circuit_breaker_rejections_total",
+    "Calls failed fast because the upstream's circuit was open",
+    ["upstream"],
+)
+
+PASSWORD_HASH_DURATION = Histogram(
+    "password_hash_duration_seconds",
+    "bcrypt hash/verify time including wait for a hashing worker",
+    ["operation"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0),
+)
+
+
+class StatsCollector:
+    """Metrics read at scrape time from components that keep their own stats() counters
+
+    ``counters`` and ``gauges`` map a key of the stats dict to a metric name
+    and help text; keys a source does not report are skipped. Sources are
+    added with add(), one per set of label values.
+    """
+
+    def __init__(
+        self,
+        label_names: Sequence[str],
+        counters: Dict[str, Tuple[str, str]],
+        gauges: Dict[str, Tuple[str, str]],
+    ):
+        self.label_names = list(label_names)
+        self.counters = counters
+        self.gauges = gauges
+        self.sources: Dict[Tuple[str, ...], Callable[[], Mapping[str, Any]]] = {}
+        REGISTRY.register(self)
+
+    def add(self, stats: Callable[[], Mapping[str, Any]], *label_values: str) -> None:
+        """Report ``stats()`` under ``label_values``, replacing any earlier source for them"""
+        self.sources[tuple(label_values)] = stats
+
+    def _families(self) -> List[Tuple[str, Any]]:
+        return [
+            (key, CounterMetricFamily(name, documentation, labels=self.label_names))
+            for key, (name, documentation) in self.counters.items()
+        ] + [
+            (key, GaugeMetricFamily(name, documentation, labels=self.label_names))
+            for key, (name, documentation) in self.gauges.items()
+        ]
+
+    def describe(self):
+        return [family for _, family in self._families()]
+
+    def collect(self):
+        families = self._families()
+        for label_values, stats in list(self.sources.items()):
+            try:
+                values = stats()
+            except Exception:
+                logger.exception("Reading stats for %s failed", label_values)
+                continue
+            for key, family in families:
+                if values.get(key) is not None:
+                    family.add_metric(list(label_values), float(values[key]))
+        return [family for _, family in families]
+
+
+DB_POOL_STATS = StatsCollector(
+    ["service"],
+    counters={
+        "checkouts": ("db_pool_checkouts_total", "Connections checked out of the pool"),
+        "timeouts": ("db_pool_checkout_timeouts_total", "Checkouts that gave up after pool_timeout with no free connection"),
+        "wait_seconds_total": ("db_pool_checkout_wait_seconds_total", "Time spent waiting for a pooled connection"),
+    },
+    gauges={
+        "size": ("db_pool_size", "Connections the pool keeps open"),
+        "checked_out": ("db_pool_checked_out", "Connections currently in use"),
+        "checked_in": ("db_pool_checked_in", "Idle connections in the pool"),
+        "overflow": ("db_pool_overflow", "Connections open beyond the pool size (negative while below it)"),
+        "wait_seconds_max": ("db_pool_checkout_wait_seconds_max", "Longest wait for a pooled connection since start"),
+    },
+)
+
+CACHE_STATS = StatsCollector(
+    ["service", "cache"],
+    counters={
+        "hits": ("cache_hits_total", "Cache lookups answered from the cache"),
+        "misses": ("cache_misses_total", "Cache lookups that missed"),
+        "evictions": ("cache_evictions_total", "Entries dropped to stay within the cache's size bound"),
+        "coalesced": ("cache_coalesced_lookups_total", "Lookups that joined one already in flight for the same key"),
+    },
+    gauges={
+        "size": ("cache_entries", "Entries currently held in the cache"),
+    },
+)
+
+
+def route_template(scope: Scope) -> str:
+    """Return the matched route path (e.g. /notes/{note_id}) to keep label cardinality bounded
+
+    Starlette/FastAPI record the matched route in the scope while routing,
+    so this is only meaningful once the request has been handled.
+    """
+    route = scope.get("route")
+    return getattr(route, "path", None) or "unmatched"
+
+
+class MetricsMiddleware:
+    """Record per-route request counts and latency, and requests in flight"""
+
+    def __init__(self, app: ASGIApp, service: str):
+        self.app = app
+        self.service = service
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        status_code = 500
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        # The route is not known until routing has run, so in-flight
+        # requests are tracked per method
+        in_progress = HTTP_REQUESTS_IN_PROGRESS.labels(self.service, method)
+        in_progress.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route = route_template(scope)
+            HTTP_REQUEST_DURATION.labels(self.service, method, route).observe(time.perf_counter() - started)
+            HTTP_REQUESTS.labels(self.service, method, route, str(status_code)).inc()
+            in_progress.dec()
+
+
+def metrics_endpoint(request: Request) -> Response:
+    """Serve all metrics in the Prometheus text exposition format"""
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
+
+def _statement_operation(statement: str) -> str:
+    words = statement.lstrip().split(None, 1)
+    return words[0].upper() if words else "UNKNOWN"
+
+
+def instrument_engine(engine) -> None:
+    """Time every SQL statement run on a (sync) engine via cursor execute events"""
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info["query_started"].pop()
+        operation = _statement_operation(statement)
+        DB_QUERIES.labels(operation).inc()
+        DB_QUERY_DURATION.labels(operation).observe(time.perf_counter() - started)
+
+    @event.listens_for(engine, "handle_error")
+    def handle_error(context):
+        if context.connection is not None and context.connection.info.get("query_started"):
+            context.connection.info["query_started"].pop()
+        DB_QUERY_ERRORS.labels(_statement_operation(context.statement or "")).inc()
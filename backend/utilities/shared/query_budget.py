@@ -0,0 +1,166 @@
+import logging
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, List, Mapping, Optional, Tuple
+
+from sqlalchemy import event
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from .metrics import route_template
+
+logger = logging.getLogger(__name__)
+
+# Response headers reporting the SQL work done before the response started
+QUERY_COUNT_HEADER = "x-db-query-count"
+QUERY_TIME_HEADER = "x-db-time-ms"
+
+# A statement run this many times in one scope is reported as a likely N+1
+N_PLUS_ONE_THRESHOLD = 5
+
+
+class QueryStats:
+    """SQL statements executed within one scope, and the time spent in them"""
+
+    def __init__(self, parent: Optional["QueryStats"] = None):
+        self.parent = parent
+        self.count = 0
+        self.seconds = 0.0
+        self.statements: Counter = Counter()
+
+    def record(self, statement: str, seconds: float) -> None:
+        stats: Optional[QueryStats] = self
+        while stats is not None:
+            stats.count += 1
+            stats.seconds += seconds
+            stats.statements[statement] += 1
+            stats = stats.parent
+
+    def repeated(self, threshold: int = N_PLUS_ONE_THRESHOLD) -> List[Tuple[str, int]]:
+        """Statements run at least ``threshold`` times, most repeated first"""
+        return [(statement, n) for statement, n in self.statements.most_common() if n >= threshold]
+
+
+_current: ContextVar[Optional[QueryStats]] = ContextVar("query_stats", default=None)
+
+
+def track_queries(engine) -> None:
+    """Record every SQL statement run on a (sync) engine in the active QueryStats scope"""
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if context is not None and _current.get() is not None:
+            context.query_budget_started = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        stats = _current.get()
+        started = getattr(context, "query_budget_started", None)
+        if stats is not None and started is not None:
+            stats.record(statement, time.perf_counter() - started)
+
+
+@contextmanager
+def count_queries() -> Iterator[QueryStats]:
+    """Collect the statements run by the enclosed code, including in threadpool calls
+
+    Only engines made by shared.database are instrumented. Scopes nest: a
+    statement counts towards every enclosing scope.
+    """
+    stats = QueryStats(_current.get())
+    token = _current.set(stats)
+    try:
+        yield stats
+    finally:
+        _current.reset(token)
+
+
+class QueryBudgetExceeded(AssertionError):
+    """More SQL statements ran than a budget allows"""
+
+    def __init__(self, label: str, budget: int, count: int, statements: Optional[Counter] = None):
+        lines = [f"{label} ran {count} SQL statements, budget is {budget}"]
+        for statement, n in (statements or Counter()).most_common():
+            lines.append(f"  {n}x {' '.join(statement.split())}")
+        super().__init__("\n".join(lines))
+        self.label = label
+        self.budget = budget
+        self.count = count
+
+
+@contextmanager
+def query_budget(max_queries: int, label: str = "block") -> Iterator[QueryStats]:
+    """Fail with QueryBudgetExceeded if the enclosed code runs more than ``max_queries`` statements
+
+        with query_budget(1, "GET /notes"):
+            client.get("/notes", headers=headers)
+    """
+    with count_queries() as stats:
+        yield stats
+    if stats.count > max_queries:
+        raise QueryBudgetExceeded(label, max_queries, stats.count, stats.statements)
+
+
+def response_query_count(headers: Mapping[str, str]) -> Optional[int]:
+    """The statement count a QueryStatsMiddleware reported, or None if the header is missing"""
+    value = headers.get(QUERY_COUNT_HEADER)
+    return int(value) if value is not None else None
+
+
+def assert_query_budget(response, max_queries: int) -> None:
+    """Check a response's reported query count, e.g. in tests against a running server"""
+    count = response_query_count(response.headers)
+    label = f"{response.request.method} {response.request.url.path}"
+    if count is None:
+        raise AssertionError(f"{label} has no {QUERY_COUNT_HEADER} header; is QueryStatsMiddleware enabled?")
+    if count > max_queries:
+        raise QueryBudgetExceeded(label, max_queries, count)
+
+
+class QueryStatsMiddleware:
+    """Count and time each request's SQL statements
+
+    With ``headers`` on, responses carry X-DB-Query-Count and X-DB-Time-Ms
+    (work done before the response started, so a streamed body's queries
+    are not included). Requests to a route in ``budgets`` (keyed
+    "METHOD /route/{template}") that run more statements than allowed, and
+    statements repeated N+1 style, are logged as warnings.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        headers: bool = True,
+        budgets: Optional[Dict[str, int]] = None,
+        n_plus_one_threshold: int = N_PLUS_ONE_THRESHOLD,
+    ):
+        self.app = app
+        self.headers = headers
+        self.budgets = budgets or {}
+        self.n_plus_one_threshold = n_plus_one_threshold
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        with count_queries() as stats:
+            async def send_with_stats(message: Message) -> None:
+                if self.headers and message["type"] == "http.response.start":
+                    headers = MutableHeaders(scope=message)
+                    headers[QUERY_COUNT_HEADER] = str(stats.count)
+                    headers[QUERY_TIME_HEADER] = f"{stats.seconds * 1000:.3f}"
+                await send(message)
+
+            try:
+                await self.app(scope, receive, send_with_stats)
+            finally:
+                self._check(f"{scope['method']} {route_template(scope)}", stats)
+
+    def _check(self, route: str, stats: QueryStats) -> None:
+        budget = self.budgets.get(route)
+        if budget is not None and stats.count > budget:
+            logger.warning("%s ran %d SQL statements, budget is %d", route, stats.count, budget)
+        for statement, n in stats.repeated(self.n_plus_one_threshold):
+            logger.warning("%s ran one statement %d times (possible N+1): %s", route, n, " ".join(statement.split())[:200])
@@ -0,0 +1,233 @@
+import asyncio
+import ipaddress
+import json
+import math
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Tuple
+from urllib.parse import parse_qs
+
+from starlette.datastructures import Headers
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from .metrics import RATE_LIMITED
+
+PERIODS = {"second": 1.0, "minute": 60.0, "hour": 3600.0}
+
+# Bodies larger than this are not parsed for a username (login forms are tiny)
+MAX_KEY_BODY_BYTES = 16_384
+
+
+@dataclass(frozen=True)
+class RateLimit:
+    """Token bucket holding up to ``burst`` tokens, refilled at ``rate`` per second"""
+
+    rate: float
+    burst: float
+
+
+def parse_rate_limit(value: str) -> RateLimit:
+    """Parse "<count>/<second|minute|hour>" into a bucket of ``count`` tokens per period"""
+    count, _, period = value.partition("/")
+    try:
+        amount = float(count)
+        seconds = PERIODS[period.strip()]
+    except (KeyError, ValueError) as e:
+        raise ValueError(f"Invalid rate limit: {value!r}") from e
+    if amount <= 0:
+        raise ValueError(f"Invalid rate limit: {value!r}")
+    return RateLimit(rate=amount / seconds, burst=amount)
+
+
+class RateLimitBackend(ABC):
+    """Token bucket store; swap in a shared implementation (e.g. Redis) for multiple replicas"""
+
+    @abstractmethod
+    async def acquire(self, key: str, limit: RateLimit) -> float:
+        """Take one token from ``key``'s bucket; returns 0 if taken, else seconds until one is available"""
+
+
+class InMemoryRateLimitBackend(RateLimitBackend):
+    """Process-local buckets, for single-replica deployments, tests and local runs
+
+    At most ``max_keys`` buckets are kept; the least recently used is
+    dropped first, which at worst gives that client a fresh bucket.
+    """
+
+    def __init__(self, max_keys: int = 100_000):
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+
+    async def acquire(self, key: str, limit: RateLimit) -> float:
+        now = time.monotonic()
+        tokens, updated = self._buckets.get(key, (limit.burst, now))
+        tokens = min(limit.burst, tokens + (now - updated) * limit.rate)
+
+        if tokens >= 1:
+            tokens -= 1
+            wait = 0.0
+        else:
+            wait = (1 - tokens) / limit.rate
+
+        self._buckets[key] = (tokens, now)
+        self._buckets.move_to_end(key)
+        while len(self._buckets) > self.max_keys:
+            self._buckets.popitem(last=False)
+        return wait
+
+
+def _route_path(scope: Scope) -> str:
+    path = scope["path"]
+    root_path = scope.get("root_path", "")
+    if root_path and path.startswith(root_path):
+        path = path[len(root_path):] or "/"
+    return path
+
+
+def _username(headers: Headers, body: bytes) -> Optional[str]:
+    """Pull the username field from a form or JSON request body"""
+    content_type = headers.get("content-type", "")
+    try:
+        if content_type.startswith("application/x-www-form-urlencoded"):
+            values = parse_qs(body.decode(), max_num_fields=32).get("username")
+            username = values[0] if values else None
+        elif content_type.startswith("application/json"):
+            data = json.loads(body)
+            username = data.get("username") if isinstance(data, dict) else None
+        else:
+            return None
+    except (ValueError, UnicodeDecodeError):
+        return None
+    if not isinstance(username, str):
+        return None
+    return username.strip().lower()[:256] or None
+
+
+class RateLimitMiddleware:
+    """Admission control for expensive routes: per-client token buckets and a concurrency cap
+
+    Requests to a path in ``limits`` take a token from the bucket for their
+    client IP (unless ``per_ip`` is off); an empty bucket gets a 429 with
+    Retry-After. X-Forwarded-For is only believed from ``trusted_proxies``
+    (addresses or CIDR ranges), and the client is the nearest address in
+    it that is not a trusted proxy. When the body
+    names a username they also take one from that username's bucket, but
+    an empty one only delays the request by up to ``max_user_delay``
+    seconds: rejecting would let anyone lock a user out by failing logins
+    in their name. At most ``max_concurrency`` limited requests run at once
+    and the rest are shed with a 503 instead of queueing. Other paths pass
+    through untouched.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        limits: Dict[str, RateLimit],
+        backend: Optional[RateLimitBackend] = None,
+        max_concurrency: int = 0,
+        service: str = "",
+        trusted_proxies: Sequence[str] = (),
+        per_ip: bool = True,
+        max_user_delay: float = 2.0,
+    ):
+        self.app = app
+        self.limits = limits
+        self.backend = backend or InMemoryRateLimitBackend()
+        self.max_concurrency = max_concurrency
+        self.service = service
+        self.trusted_proxies = [ipaddress.ip_network(proxy, strict=False) for proxy in trusted_proxies]
+        self.per_ip = per_ip
+        self.max_user_delay = max_user_delay
+        self.in_flight = 0
+
+    def _is_trusted_proxy(self, address: str) -> bool:
+        try:
+            ip = ipaddress.ip_address(address)
+        except ValueError:
+            return False
+        return any(ip in network for network in self.trusted_proxies)
+
+    def _client_ip(self, scope: Scope, headers: Headers) -> str:
+        client = scope.get("client")
+        address = client[0] if client else "unknown"
+        if not self._is_trusted_proxy(address):
+            return address
+        # Each trusted hop appended the address it saw; walk back to the first untrusted one
+        hops = [hop.strip() for hop in ",".join(headers.getlist("x-forwarded-for")).split(",") if hop.strip()]
+        for hop in reversed(hops):
+            if not self._is_trusted_proxy(hop):
+                return hop
+            address = hop
+        return address
+
+    async def _read_body(self, receive: Receive) -> Tuple[bytes, List[Message]]:
+        """Read the request body so it can be inspected, keeping the messages to replay"""
+        messages = []
+        size = 0
+        while True:
+            message = await receive()
+            messages.append(message)
+            if message["type"] != "http.request":
+                break
+            size += len(message.get("body", b""))
+            if not message.get("more_body", False) or size > MAX_KEY_BODY_BYTES:
+                break
+        if size > MAX_KEY_BODY_BYTES:
+            return b"", messages
+        return b"".join(message.get("body", b"") for message in messages), messages
+
+    async def _reject(self, scope: Scope, receive: Receive, send: Send, route: str, reason: str, status_code: int, retry_after: float) -> None:
+        RATE_LIMITED.labels(self.service, route, reason).inc()
+        detail = "Too many requests" if status_code == 429 else "Server busy, try again later"
+        response = JSONResponse(
+            {"detail": detail},
+            status_code=status_code,
+            headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+        )
+        await response(scope, receive, send)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        route = _route_path(scope)
+        limit = self.limits.get(route)
+        if limit is None:
+            await self.app(scope, receive, send)
+            return
+
+        # Shed before reading the body or spending a client's tokens
+        if self.max_concurrency and self.in_flight >= self.max_concurrency:
+            await self._reject(scope, receive, send, route, "concurrency", 503, 1)
+            return
+
+        self.in_flight += 1
+        try:
+            headers = Headers(scope=scope)
+            body, messages = await self._read_body(receive)
+
+            if self.per_ip:
+                wait = await self.backend.acquire(f"{route}:ip:{self._client_ip(scope, headers)}", limit)
+                if wait > 0:
+                    await self._reject(scope, receive, send, route, "ip", 429, wait)
+                    return
+
+            username = _username(headers, body)
+            if username is not None and self.max_user_delay > 0:
+                wait = await self.backend.acquire(f"{route}:user:{username}", limit)
+                if wait > 0:
+                    RATE_LIMITED.labels(self.service, route, "user_delayed").inc()
+                    await asyncio.sleep(min(wait, self.max_user_delay))
+
+            async def replay() -> Message:
+                if messages:
+                    return messages.pop(0)
+                return await receive()
+
+            await self.app(scope, replay, send)
+        finally:
+            self.in_flight -= 1
@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, TypeAdapter
 from datetime import datetime
 
 
@@ -10,3 +10,7 @@ class UserResponse(BaseModel):
 
     class Config:
         from_attributes = True
+
+
+# Prebuilt serializer for the fast response path (see shared.serialization)
+user_response_adapter = TypeAdapter(UserResponse)
@@ -0,0 +1,32 @@
+from typing import Any, Optional
+
+from fastapi.responses import JSONResponse, Response
+from pydantic import TypeAdapter
+
+try:
+    import orjson
+except ImportError:  # optional: install shared[fast]
+    orjson = None
+
+
+class ORJSONResponse(JSONResponse):
+    """JSONResponse rendered with orjson when it is installed"""
+
+    def render(self, content: Any) -> bytes:
+        if orjson is None:
+            return super().render(content)
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+
+
+def model_response(adapter: TypeAdapter, value: Any, response: Optional[Response] = None) -> Response:
+    """Serialize ORM objects to JSON bytes in one pass with a prebuilt TypeAdapter
+
+    Skips FastAPI's response_model round trip (validate, convert to
+    jsonable Python, then json.dumps). Headers already set on an injected
+    ``response`` (ETag, cursors, ...) are carried over.
+    """
+    body = adapter.dump_json(adapter.validate_python(value, from_attributes=True))
+    headers = dict(response.headers) if response is not None else None
+    status_code = response.status_code if response is not None and response.status_code else 200
+    return Response(content=body, status_code=status_code, headers=headers, media_type="application/json")
+
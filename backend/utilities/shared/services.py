@@ -0,0 +1,38 @@
+"""Import the auth and notes FastAPI apps side by side in one process
+
+Both services are laid out as a top-level ``app`` package plus ``main.py``,
+so importing the second would normally pick up the first one's modules.
+load_service() imports a service with its directory on sys.path and then
+moves its ``app``/``main`` modules out of the way for the next one.
+"""
+import importlib
+import os
+import sys
+from types import ModuleType
+from typing import Dict
+
+# backend/services when running from a source checkout
+SERVICES_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "services"))
+
+
+def _pop_service_modules() -> Dict[str, ModuleType]:
+    names = [name for name in sys.modules if name in ("app", "main") or name.startswith("app.")]
+    return {name: sys.modules.pop(name) for name in names}
+
+
+def load_service(name: str, services_dir: str = SERVICES_DIR) -> Dict[str, ModuleType]:
+    """Import <services_dir>/<name>/main.py and return its modules by name
+
+    The result maps "main", "app.config", "app.services.auth", ... to the
+    service's own modules. Settings come from the environment.
+    """
+    service_dir = os.path.join(services_dir, name)
+    previous = _pop_service_modules()
+    sys.path.insert(0, service_dir)
+    try:
+        importlib.import_module("main")
+    finally:
+        sys.path.remove(service_dir)
+        modules = _pop_service_modules()
+        sys.modules.update(previous)
+    return modules
@@ -0,0 +1,188 @@
+import base64
+import zlib
+from typing import Optional
+
+from sqlalchemy import String
+from sqlalchemy.types import TypeDecorator
+
+try:
+    import zstandard
+except ImportError:  # optional: install shared[fast]
+    zstandard = None
+
+# Stored values that start with MARKER are "<MARKER><codec>:<payload>".
+# Anything else is plain text, so rows written before compression still read.
+MARKER = "\x01"
+RAW = "raw"  # plain text that itself starts with MARKER, stored escaped
+ZLIB = "zlib"
+ZSTD = "zstd"
+
+# Worst-case UTF-8 bytes per character, for reading a character prefix
+_MAX_UTF8_BYTES = 4
+
+# zstd values end their first block after this many bytes, so a short
+# prefix of the stored value decodes a snippet (zlib output streams anyway)
+PREFIX_BLOCK_BYTES = 1024
+
+
+def resolve_codec(preferred: str) -> str:
+    """Return the codec to write with: zstd when requested and installed, otherwise zlib"""
+    if preferred in (ZSTD, "auto") and zstandard is not None:
+        return ZSTD
+    if preferred not in (ZLIB, ZSTD, "auto"):
+        raise ValueError(f"Unknown text compression codec: {preferred}")
+    return ZLIB
+
+
+def is_compressed(value: str) -> bool:
+    return value.startswith(MARKER) and not value.startswith(f"{MARKER}{RAW}:")
+
+
+def compress_text(value: str, threshold: int, codec: str = ZLIB, level: int = 6) -> str:
+    """Encode text for storage, compressing it when at least ``threshold`` UTF-8 bytes
+
+    Compressed payloads are base64 so they fit a text column; values are only
+    stored compressed when that is actually smaller.
+    """
+    data = value.encode()
+    if len(data) >= threshold:
+        if codec == ZSTD:
+            compressor = zstandard.ZstdCompressor(level=level).compressobj(size=len(data))
+            compressed = (
+                compressor.compress(data[:PREFIX_BLOCK_BYTES])
+                + compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+                + compressor.compress(data[PREFIX_BLOCK_BYTES:])
+                + compressor.flush()
+            )
+        else:
+            compressed = zlib.compress(data, level)
+        encoded = f"{MARKER}{codec}:{base64.b64encode(compressed).decode()}"
+        if len(encoded) < len(data):
+            return encoded
+
+    if value.startswith(MARKER):
+        return f"{MARKER}{RAW}:{value}"
+    return value
+
+
+def _split(value: str):
+    codec, _, payload = value[1:].partition(":")
+    return codec, payload
+
+
+def decompress_text(value: str) -> str:
+    """Decode a value written by compress_text (plain text passes through)"""
+    if not value.startswith(MARKER):
+        return value
+
+    codec, payload = _split(value)
+    if codec == RAW:
+        return payload
+    data = base64.b64decode(payload)
+    if codec == ZLIB:
+        return zlib.decompress(data).decode()
+    if codec == ZSTD:
+        if zstandard is None:
+            raise RuntimeError("zstd-compressed text found but the zstandard package is not installed")
+        return zstandard.ZstdDecompressor().decompressobj().decompress(data).decode()
+    raise ValueError(f"Unknown text compression codec: {codec}")
+
+
+def stored_prefix_length(length: int) -> int:
+    """Characters of a stored value that decode to at least its first ``length`` characters
+
+    Holds for everything compress_text writes; zstd values written before
+    PREFIX_BLOCK_BYTES existed may need more.
+    """
+    max_bytes = max(length * _MAX_UTF8_BYTES, PREFIX_BLOCK_BYTES)
+    # Deflate can spend up to ~2 bits per byte more early in a block, plus headers
+    payload_bytes = 2 * max_bytes + 512
+    return len(f"{MARKER}{ZSTD}:") + 4 * -(-payload_bytes // 3)
+
+
+def decompress_text_prefix(value: str, length: int, stored_length: Optional[int] = None) -> Optional[str]:
+    """Return the first ``length`` characters, decompressing only as much as needed
+
+    ``value`` may be cut to its first ``stored_length`` characters; if that
+    turns out to be too little to decode ``length`` characters, returns None.
+    """
+    if not is_compressed(value):
+        return decompress_text(value)[:length]
+
+    codec, payload = _split(value)
+    truncated = stored_length is not None and len(value) >= stored_length
+    if truncated:
+        # Drop a partial base64 quantum left by the cut
+        payload = payload[:len(payload) - len(payload) % 4]
+    data = base64.b64decode(payload)
+    max_bytes = length * _MAX_UTF8_BYTES
+    if codec == ZLIB:
+        prefix = zlib.decompressobj().decompress(data, max_bytes)
+    elif codec == ZSTD:
+        if zstandard is None:
+            raise RuntimeError("zstd-compressed text found but the zstandard package is not installed")
+        if truncated:
+            # Unlike stream_reader, a decompressobj accepts a frame cut short
+            prefix = zstandard.ZstdDecompressor().decompressobj().decompress(data)[:max_bytes]
+        else:
+            with zstandard.ZstdDecompressor().stream_reader(data) as reader:
+                prefix = reader.read(max_bytes)
+    else:
+        raise ValueError(f"Unknown text compression codec: {codec}")
+    # The cut may split a multi-byte character; drop the fragment
+    text = prefix.decode(errors="ignore")[:length]
+    if truncated and len(text) < length:
+        return None
+    return text
+
+
+class CompressedText(TypeDecorator):
+    """String column whose large values are stored compressed (see compress_text)
+
+    Comparisons against the column are made on the stored form, so do not
+    filter on the content of compressed rows in SQL.
+    """
+
+    impl = String
+    cache_ok = True
+
+    def __init__(self, threshold: int = 4096, codec: str = ZLIB, level: int = 6):
+        super().__init__()
+        self.threshold = threshold
+        self.codec = codec
+        self.level = level
+
+    def process_bind_param(self, value: Optional[str], dialect) -> Optional[str]:
+        if value is None:
+            return None
+        return compress_text(value, self.threshold, self.codec, self.level)
+
+    def process_result_value(self, value: Optional[str], dialect) -> Optional[str]:
+        if value is None:
+            return None
+        return decompress_text(value)
+
+    def coerce_compared_value(self, op, value):
+        return String()
+
+
+class CompressedTextPrefix(TypeDecorator):
+    """Result type that decodes only the first ``length`` characters of a CompressedText value
+
+    With ``stored_length``, the selected value may be a prefix of that many
+    characters (e.g. substr(content, 1, stored_prefix_length(length))); rows
+    where that was not enough come back as None.
+    """
+
+    impl = String
+    cache_ok = True
+
+    def __init__(self, length: int, stored_length: Optional[int] = None):
+        super().__init__()
+        self.length = length
+        self.stored_length = stored_length
+
+    def process_result_value(self, value: Optional[str], dialect) -> Optional[str]:
+        if value is None:
+            return None
+        return decompress_text_prefix(value, self.length, self.stored_length)
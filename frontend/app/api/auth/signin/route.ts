@@ -1,5 +1,6 @@
 import { NextRequest, NextResponse } from 'next/server';
 import { API_CONFIG } from '@/app/config/api';
+import { clientForwardingHeaders } from '@/app/lib/forwarding';
 import { setTokenCookies, type TokenData } from '@/app/lib/tokenUtils';
 
 export async function POST(request: NextRequest) {
@@ -16,6 +17,7 @@ export async function POST(request: NextRequest) {
       method: 'POST',
       headers: {
         'Content-Type': 'application/x-www-form-urlencoded',
+        ...clientForwardingHeaders(request),
       },
       body: formData,
     });
@@ -1,5 +1,6 @@
 import { NextRequest, NextResponse } from 'next/server';
 import { API_CONFIG } from '@/app/config/api';
+import { clientForwardingHeaders } from '@/app/lib/forwarding';
 
 export async function POST(request: NextRequest) {
   try {
@@ -10,6 +11,7 @@ export async function POST(request: NextRequest) {
       method: 'POST',
       headers: {
         'Content-Type': 'application/json',
+        ...clientForwardingHeaders(request),
       },
       body: JSON.stringify(body),
     });
@@ -0,0 +1,11 @@
+import { NextRequest } from 'next/server';
+
+/**
+ * Headers that tell the auth service which client a server-side call is for,
+ * so its per-IP rate limits don't put every user in this server's bucket.
+ * The auth service only believes them from its configured trusted proxies.
+ */
+export function clientForwardingHeaders(request: NextRequest): Record<string, string> {
+  const forwardedFor = request.headers.get('x-forwarded-for');
+  return forwardedFor ? { 'X-Forwarded-For': forwardedFor } : {};
+}